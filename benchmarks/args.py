@@ -0,0 +1,92 @@
+"""
+microbenchmarks for utils/grammar.py and the Mode/Mods codecs, next to the
+string splitting and per-call dict building they replaced (kept here as
+`legacy_*` so the numbers stay comparable).
+
+usage: python -m benchmarks.args [--number N]
+"""
+from __future__ import annotations
+
+import argparse
+import timeit
+
+from typing import Callable, List, Optional, Tuple
+
+from utils.grammar import parse_command
+from utils.OsuMapping import Mode, Mods
+
+INPUTS = (
+    "",
+    "ano",
+    "+rx!std",
+    "ano +rx!std",
+    "ano+rx!std",
+    "some long name +002!mania",
+    "ano +rx!std +HDDT acc>=98 -s pp -p 2 -c",
+)
+
+def legacy_from_string(mode_str: str) -> int:
+    """Mode.from_string before the tables moved to module level"""
+    mode_mapping = {
+        "vn!std": 0, "vn!taiko": 1, "vn!catch": 2, "vn!mania": 3,
+        "rx!std": 4, "rx!taiko": 5, "rx!catch": 6, "rx!mania": 7, "ap!std": 8,
+        "001!std": 0, "001!taiko": 1, "001!catch": 2, "001!mania": 3,
+        "002!std": 4, "002!taiko": 5, "002!catch": 6, "002!mania": 7,
+    }
+
+    return mode_mapping.get(mode_str.lower(), 0)
+
+def legacy_parse(args: str) -> Tuple[Optional[str], int]:
+    """ArgParsing.parse_args minus the discord and database parts"""
+    username = ""
+    mode = 0
+
+    if args:
+        if args.startswith('+'):
+            parts = args[1:].split(None, 1)
+            mode = legacy_from_string(parts[0])
+            if len(parts) > 1:
+                username = parts[1].strip()
+        else:
+            parts = args.split('+')
+            if len(parts) > 1:
+                username = parts[0].strip()
+                mode = legacy_from_string(parts[1].strip())
+            else:
+                username = args.strip()
+
+    return username, mode
+
+def bench(name: str, fn: Callable[[], object], number: int) -> float:
+    # NOTE: best of 5, the minimum is the least noisy estimate for tiny functions
+    ns = min(timeit.repeat(fn, number=number, repeat=5)) / number * 1e9
+    print(f"{name:<48}{ns:>10.0f} ns")
+    return ns
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--number', type=int, default=100_000)
+    args = parser.parse_args()
+
+    results: List[Tuple[str, float, float]] = []
+
+    # NOTE: the legacy parser can't do mods/flags, only compare what both understand
+    for text in INPUTS:
+        new = bench(f"parse_command({text!r})", lambda: parse_command(text), args.number)
+        if '-' not in text and text.count('+') <= 1:
+            old = bench(f"legacy_parse({text!r})", lambda: legacy_parse(text), args.number)
+            results.append((text, old, new))
+
+    print()
+    bench("Mode.from_string('002!std')", lambda: Mode.from_string('002!std'), args.number)
+    bench("legacy_from_string('002!std')", lambda: legacy_from_string('002!std'), args.number)
+    bench("Mode.to_string(4)", lambda: Mode.to_string(4), args.number)
+    bench("Mods.from_modstr('HDDTHR')", lambda: Mods.from_modstr('HDDTHR'), args.number)
+    bench("Mods.to_modstr(HDDTHR)", lambda: Mods.to_modstr(88), args.number)
+
+    print()
+    for text, old, new in results:
+        print(f"{text!r:<48}{old / new:>9.2f}x")
+
+if __name__ == '__main__':
+    main()
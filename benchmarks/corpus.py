@@ -0,0 +1,123 @@
+"""
+writes the synthetic .osu corpus in benchmarks/corpus, deterministic so
+the files only change when this script does.
+
+usage: python -m benchmarks.corpus
+"""
+from __future__ import annotations
+
+import random
+
+from pathlib import Path
+from typing import List, NamedTuple
+
+CORPUS_DIR = Path(__file__).parent / "corpus"
+
+class CorpusMap(NamedTuple):
+    name: str
+    mode: int
+    objects: int
+    bpm: float
+    keys: int = 4 # NOTE: mania only, CircleSize is the key count there
+
+CORPUS = (
+    CorpusMap("std-short", 0, 250, 180.0),
+    CorpusMap("std-long", 0, 2500, 200.0),
+    CorpusMap("std-stream", 0, 1200, 240.0),
+    CorpusMap("taiko", 1, 1200, 190.0),
+    CorpusMap("catch", 2, 800, 170.0),
+    CorpusMap("mania-7k", 3, 2000, 175.0, keys=7),
+)
+
+def hit_objects(spec: CorpusMap, rng: random.Random) -> List[str]:
+    beat = 60000 / spec.bpm
+    time = 1000.0
+    x, y = 256, 192
+    lines = []
+
+    for i in range(spec.objects):
+        # NOTE: mostly 1/2 and 1/4 rhythm, "stream" maps stay on 1/4
+        time += beat / (4 if spec.name.endswith("stream") or rng.random() < 0.3 else 2)
+
+        if spec.mode == 3:
+            column = rng.randrange(spec.keys)
+            x = int((column + 0.5) * 512 / spec.keys)
+            if rng.random() < 0.1:
+                lines.append(f"{x},192,{int(time)},128,0,{int(time + beat)}:0:0:0:0:")
+            else:
+                lines.append(f"{x},192,{int(time)},1,0,0:0:0:0:")
+            continue
+
+        x = min(max(x + rng.randint(-120, 120), 0), 512)
+        y = min(max(y + rng.randint(-90, 90), 0), 384)
+        new_combo = 4 if i % 8 == 0 else 0
+        hitsound = rng.choice((0, 0, 2, 8)) if spec.mode == 1 else 0
+
+        if spec.mode != 1 and rng.random() < 0.15:
+            end_x = min(max(x + rng.randint(-100, 100), 0), 512)
+            end_y = min(max(y + rng.randint(-80, 80), 0), 384)
+            length = max(abs(end_x - x) + abs(end_y - y), 20)
+            lines.append(f"{x},{y},{int(time)},{2 | new_combo},{hitsound},L|{end_x}:{end_y},1,{length}")
+            time += beat / 2
+        else:
+            lines.append(f"{x},{y},{int(time)},{1 | new_combo},{hitsound},0:0:0:0:")
+
+    return lines
+
+def render(spec: CorpusMap) -> str:
+    rng = random.Random(spec.name)
+    beat = 60000 / spec.bpm
+
+    return "\n".join([
+        "osu file format v14",
+        "",
+        "[General]",
+        "AudioFilename: audio.mp3",
+        "AudioLeadIn: 0",
+        "PreviewTime: -1",
+        "Countdown: 0",
+        "SampleSet: Normal",
+        "StackLeniency: 0.7",
+        f"Mode: {spec.mode}",
+        "LetterboxInBreaks: 0",
+        "",
+        "[Metadata]",
+        f"Title:{spec.name}",
+        "TitleUnicode:",
+        "Artist:kselon",
+        "ArtistUnicode:",
+        "Creator:benchmarks",
+        f"Version:{spec.name}",
+        "Source:",
+        "Tags:synthetic",
+        "BeatmapID:0",
+        "BeatmapSetID:-1",
+        "",
+        "[Difficulty]",
+        "HPDrainRate:5",
+        f"CircleSize:{spec.keys if spec.mode == 3 else 4}",
+        "OverallDifficulty:8",
+        "ApproachRate:9",
+        "SliderMultiplier:1.4",
+        "SliderTickRate:1",
+        "",
+        "[Events]",
+        "",
+        "[TimingPoints]",
+        f"0,{beat},4,2,0,60,1,0",
+        "",
+        "[HitObjects]",
+        *hit_objects(spec, rng),
+        "",
+    ])
+
+def main() -> None:
+    CORPUS_DIR.mkdir(exist_ok=True)
+
+    for spec in CORPUS:
+        path = CORPUS_DIR / f"{spec.name}.osu"
+        path.write_text(render(spec), newline="\r\n") # NOTE: stable writes crlf
+        print(f"wrote {path} ({path.stat().st_size / 1024:.1f} KB)")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+"""
+loose .data files vs the pack store: read latency and disk footprint.
+
+packs a sample of .data into a temporary store, then times reading every
+map back both ways (cold-ish first pass, warm second pass).
+
+usage: python -m benchmarks.packstore [sample size]
+"""
+from __future__ import annotations
+
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+from pathlib import Path
+from typing import Callable, List
+
+from usecases.packstore import PackStore
+
+def disk_usage(paths: List[Path]) -> int:
+    """bytes actually allocated, block rounding included"""
+    return sum(os.stat(path).st_blocks * 512 for path in paths)
+
+def time_reads(md5s: List[str], read: Callable[[str], bytes]) -> List[float]:
+    timings = []
+    for md5 in md5s:
+        start = time.perf_counter()
+        read(md5)
+        timings.append((time.perf_counter() - start) * 1000)
+
+    return timings
+
+def report(name: str, timings: List[float]) -> None:
+    timings = sorted(timings)
+    print(
+        f"{name:<12} p50 {statistics.median(timings):.3f}ms  "
+        f"p95 {timings[int(len(timings) * 0.95) - 1]:.3f}ms  "
+        f"total {sum(timings):.1f}ms"
+    )
+
+def main(sample: int) -> None:
+    directory = Path(".data")
+    paths = [path for path in directory.glob("*.osu")]
+    if not paths:
+        print("no maps in .data, run the bot for a while first")
+        return
+
+    paths = random.sample(paths, min(sample, len(paths)))
+    md5s = [path.stem for path in paths]
+
+    with tempfile.TemporaryDirectory() as pack_dir:
+        store = PackStore(Path(pack_dir))
+        for path in paths:
+            store.add(path.read_bytes())
+
+        # NOTE: names that aren't their md5 got packed under the real one, leave them out
+        md5s = [md5 for md5 in md5s if md5 in store]
+
+        loose_bytes = disk_usage([directory / f"{md5}.osu" for md5 in md5s])
+        pack_bytes = disk_usage(list(Path(pack_dir).iterdir()))
+
+        print(f"{len(md5s)} maps")
+        print(f"loose files  {loose_bytes / 1024 ** 2:.1f} MB on disk, {len(md5s)} inodes")
+        print(f"pack store   {pack_bytes / 1024 ** 2:.1f} MB on disk, {len(list(Path(pack_dir).iterdir()))} inodes")
+
+        for attempt in ('cold', 'warm'):
+            random.shuffle(md5s)
+            report(f"loose {attempt}", time_reads(md5s, lambda md5: (directory / f"{md5}.osu").read_bytes()))
+            report(f"pack {attempt}", time_reads(md5s, store.read))
+
+        store.close()
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000)
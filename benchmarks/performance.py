@@ -0,0 +1,203 @@
+"""
+benchmarks for usecases/performance.py over the bundled synthetic corpus
+(benchmarks/corpus, see benchmarks/corpus.py), no network or .data needed.
+
+for every map: parse time, cold calculate_performances (empty caches, so
+parse + difficulty + performance) and warm (everything cached), as time
+and scores/second. peak memory is reported for the python heap and the
+whole process, the calculator allocates outside of python.
+
+usage: python -m benchmarks.performance [--repeat N] [--output results.json] [--compare old.json]
+"""
+from __future__ import annotations
+
+import argparse
+import gc
+import orjson
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from refx_pp_py import Beatmap
+
+from benchmarks.corpus import CORPUS, CORPUS_DIR, CorpusMap
+from usecases.performance import (
+    ScoreParams, calculate_performances,
+    beatmap_cache, calculator_cache, difficulty_cache, SUPPORTS_SET_DIFFICULTY
+)
+from usecases.ppcache import CALCULATOR_VERSION
+from utils.OsuMapping import Mods
+
+ACCURACIES = (93.0, 95.0, 97.0, 98.0, 99.0, 100.0)
+MODS = (
+    Mods.NOMOD.value,
+    Mods.HIDDEN.value,
+    Mods.HARDROCK.value,
+    Mods.DOUBLETIME.value,
+    Mods.HIDDEN.value | Mods.DOUBLETIME.value,
+    Mods.HIDDEN.value | Mods.HARDROCK.value,
+)
+
+# (AC, AR, TW, CS, HD), what refx players actually run with
+CHEATS = (
+    (0, 0, 150, False, False),
+    (5, 9.5, 150, False, False),
+    (10, 10.0, 120, True, True),
+)
+
+def score_set(spec: CorpusMap) -> List[ScoreParams]:
+    """vanilla scores, plus relax (mode + 4) with refx cheat values where the mode exists"""
+    scores = [
+        ScoreParams(mode=spec.mode, mods=mods, acc=acc, nmiss=miss, AC=0, AR=0, TW=150, CS=False, HD=False)
+        for mods in MODS for acc in ACCURACIES for miss in (0, 3)
+    ]
+
+    if spec.mode != 3:
+        scores += [
+            ScoreParams(mode=spec.mode + 4, mods=mods | Mods.RELAX.value, acc=acc, nmiss=0,
+                        AC=ac, AR=ar, TW=tw, CS=cs, HD=hd)
+            for mods in MODS for acc in ACCURACIES for ac, ar, tw, cs, hd in CHEATS
+        ]
+
+    return scores
+
+def clear_caches() -> None:
+    beatmap_cache.clear()
+    calculator_cache.clear()
+    difficulty_cache.clear()
+
+def timed(fn: Callable[[], Any], repeat: int, setup: Optional[Callable[[], None]] = None) -> List[float]:
+    """seconds per run, `setup` runs untimed before each one"""
+    timings = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+
+        gc.collect()
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+
+    return timings
+
+def summarize(timings: List[float], scores: int = 0) -> Dict[str, float]:
+    median = statistics.median(timings)
+    summary = {
+        'median_ms': median * 1000,
+        'min_ms': min(timings) * 1000,
+        'max_ms': max(timings) * 1000,
+    }
+
+    if scores:
+        summary['scores_per_sec'] = scores / median if median else 0.0
+
+    return summary
+
+def bench_map(spec: CorpusMap, repeat: int) -> Dict[str, Any]:
+    path = str(CORPUS_DIR / f"{spec.name}.osu")
+    scores = score_set(spec)
+
+    parse = timed(lambda: Beatmap(path=path), repeat)
+
+    # NOTE: cold is a fresh process as far as the caches go, warm reuses everything
+    cold = timed(lambda: calculate_performances(path, scores, spec.name), repeat, setup=clear_caches)
+    calculate_performances(path, scores, spec.name)
+    warm = timed(lambda: calculate_performances(path, scores, spec.name), repeat)
+
+    tracemalloc.start()
+    clear_caches()
+    calculate_performances(path, scores, spec.name)
+    _, python_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        'map': spec.name,
+        'mode': spec.mode,
+        'objects': spec.objects,
+        'bytes': Path(path).stat().st_size,
+        'scores': len(scores),
+        'parse': summarize(parse),
+        'cold': summarize(cold, len(scores)),
+        'warm': summarize(warm, len(scores)),
+        'python_peak_kb': python_peak / 1024,
+    }
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (subprocess.SubprocessError, FileNotFoundError):
+        return None
+
+def print_results(results: List[Dict[str, Any]], baseline: Optional[Dict[str, Dict[str, Any]]]) -> None:
+    print(f"{'map':<12}{'scores':>7}{'parse ms':>10}{'cold ms':>10}{'cold sc/s':>11}{'warm ms':>10}{'warm sc/s':>11}")
+
+    for result in results:
+        line = (
+            f"{result['map']:<12}{result['scores']:>7}{result['parse']['median_ms']:>10.2f}"
+            f"{result['cold']['median_ms']:>10.2f}{result['cold']['scores_per_sec']:>11.0f}"
+            f"{result['warm']['median_ms']:>10.2f}{result['warm']['scores_per_sec']:>11.0f}"
+        )
+
+        old = (baseline or {}).get(result['map'])
+        if old is not None:
+            # NOTE: positive means slower than the baseline
+            deltas = [
+                f"{name} {(result[name]['median_ms'] / old[name]['median_ms'] - 1) * 100:+.1f}%"
+                for name in ('parse', 'cold', 'warm') if old[name]['median_ms']
+            ]
+            line += "  (" + ", ".join(deltas) + ")"
+
+        print(line)
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--output', type=Path, default=None)
+    parser.add_argument('--compare', type=Path, default=None, help="earlier --output to diff against")
+    args = parser.parse_args()
+
+    missing = [spec.name for spec in CORPUS if not (CORPUS_DIR / f"{spec.name}.osu").exists()]
+    if missing:
+        print(f"corpus is missing {', '.join(missing)}, run python -m benchmarks.corpus")
+        return
+
+    results = [bench_map(spec, args.repeat) for spec in CORPUS]
+
+    report = {
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'commit': git_commit(),
+        'calculator_version': CALCULATOR_VERSION,
+        'difficulty_cache': SUPPORTS_SET_DIFFICULTY,
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'repeat': args.repeat,
+        # NOTE: kilobytes on linux, bytes on macos
+        'process_peak_rss': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        'maps': results,
+    }
+
+    baseline = None
+    if args.compare is not None:
+        baseline = {result['map']: result for result in orjson.loads(args.compare.read_bytes())['maps']}
+
+    print_results(results, baseline)
+    print(f"peak rss: {report['process_peak_rss']}, python heap peak: "
+          f"{max(result['python_peak_kb'] for result in results):.0f} KB")
+
+    output = args.output or Path("benchmarks") / "results" / f"performance-{datetime.now():%Y%m%d-%H%M%S}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_bytes(orjson.dumps(report, option=orjson.OPT_INDENT_2))
+    print(f"wrote {output}")
+
+if __name__ == '__main__':
+    main()
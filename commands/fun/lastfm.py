@@ -11,7 +11,7 @@ import datetime
 from typing import TYPE_CHECKING, Optional, Dict, List
 from config import lastfm
 from utils.logging import log, Ansi
-from objects import glob
+from utils.linkHelper import LinkHelper
 
 if TYPE_CHECKING:
     from main import Bot
@@ -21,6 +21,7 @@ class LastFM(commands.Cog):
         self.bot = bot
         self.api_key = lastfm
         self.base_url = "http://ws.audioscrobbler.com/2.0/"
+        self.links = LinkHelper()
         self.http_client = httpx.AsyncClient(
             timeout=30.0,
             follow_redirects=True
@@ -67,12 +68,10 @@ class LastFM(commands.Cog):
         usage: !nowplaying
         """
         if not username:
-            from_db = await glob.db.fetch('select username from lastfm where id = %s', [str(ctx.author.id)])
-            if not from_db:
+            username = await self.links.get_lastfm(ctx.author.id)
+            if not username:
                 await ctx.send("you must provide an username!, to set lastfm username: `!setlastfm <username>`")
                 return
-            
-            username = from_db['username']
 
         data = await self.fetch_lastfm_data(username)
         user = await self.fetch_user_info(username)
@@ -96,19 +95,7 @@ class LastFM(commands.Cog):
             await ctx.send("you must provide an username!")
             return
         
-        user_id = str(ctx.author.id)
-        hi = await glob.db.fetch('select * from lastfm where id = %s', [user_id])
-
-        if hi:
-            await glob.db.execute(
-                'update lastfm set id = %s, username = %s where id = %s',
-                [user_id, username, user_id]
-            )
-        else:
-            await glob.db.execute(
-                'insert into lastfm (id, username) values (%s, %s)',
-                [user_id, username]
-            )
+        await self.links.set_lastfm(ctx.author.id, username)
 
         await ctx.send(f"profile set for {username}!")
 
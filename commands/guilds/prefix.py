@@ -4,7 +4,7 @@ import discord
 from discord.ext import commands
 from typing import TYPE_CHECKING
 
-from utils.prefixHelper import PrefixHelper    
+from utils.prefixHelper import PrefixHelper, DEFAULT_PREFIX
 
 if TYPE_CHECKING:
     from main import Bot
@@ -12,8 +12,11 @@ if TYPE_CHECKING:
 async def get_prefix(bot: Bot, message: discord.Message) -> str:
     """get the prefix for a specific guild"""
     if message.guild is None:
-        return '!'
-    
+        return DEFAULT_PREFIX
+
+    if PrefixHelper.loaded:
+        return PrefixHelper.cached_prefix(message.guild.id)
+
     prefix_manager = PrefixHelper()
     return await prefix_manager.get_prefix(message.guild.id)
 
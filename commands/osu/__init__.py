@@ -1,21 +1,29 @@
 from typing import List
 
 available_commands: List[str] = [
-    'profile'
-    'setprofile'
-    'recent'
-    'top'
-    'changemod'
+    'profile',
+    'setprofile',
+    'recent',
+    'top',
+    'changemod',
+    'leaderboard',
+    'compare',
+    'map',
+    'search'
 ]
 
 from .tools import Tools
 from .profile import Profile
 from .score import Score
+from .leaderboard import Leaderboard
+from .beatmap import Beatmap
 
 __all__ = [
     'Profile',
     'Score',
     'Tools',
+    'Leaderboard',
+    'Beatmap',
     'available_commands'
 ]
 
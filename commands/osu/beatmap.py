@@ -0,0 +1,190 @@
+from __future__ import annotations
+
+import discord
+import config
+import httpx
+import re
+
+from discord.ext import commands
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+
+from commands.osu.OsuApi.api import ApiClient
+from commands.osu.score import BeatmapCalculator
+from utils.logging import log, Ansi
+from utils.grammar import ArgumentError, parse_command
+from utils.OsuMapping import Mode, Mods
+
+from usecases.performance import GRID_ACCURACIES, GRID_MODS, PerformanceGridRow, calculate_pp_grid
+from usecases.mapindex import map_index
+
+if TYPE_CHECKING:
+    from main import Bot
+
+# NOTE: osu.ppy.sh/b/1, osu.ppy.sh/beatmaps/1, osu.ppy.sh/beatmapsets/2#osu/1 and the same on our server
+BEATMAP_LINK = re.compile(r"(?:/b/|/beatmaps/|#(?:osu|taiko|fruits|mania)/)(\d+)")
+
+MODE_NAMES = {0: "std", 1: "taiko", 2: "catch", 3: "mania"}
+
+class Beatmap(commands.Cog):
+    def __init__(self, bot: Bot) -> None:
+        self.bot: Bot = bot
+        self.api = ApiClient()
+        self.server = config.Bancho
+        self.calculator = BeatmapCalculator()
+
+    @staticmethod
+    def parse_map_args(args: str) -> Tuple[Optional[int], Optional[int], Optional[int]]:
+        """(beatmap id, mods, mode) out of `<id|link> [+mods] [+mode]`, ArgumentError on unknown mods."""
+        parsed = parse_command(args)
+        beatmap_id = None
+
+        for word in (parsed.username or '').split():
+            if (match := BEATMAP_LINK.search(word)):
+                beatmap_id = int(match.group(1))
+            elif word.isdigit():
+                beatmap_id = int(word)
+
+        return beatmap_id, parsed.mods, parsed.mode
+
+    @staticmethod
+    def format_grid(rows: List[PerformanceGridRow]) -> str:
+        header = f"{'mods':<6}{'★':>5}" + "".join(f"{acc:.0f}%".rjust(9) for acc in GRID_ACCURACIES)
+        lines = [header]
+
+        for row in rows:
+            modstr = Mods.to_modstr(row.mods) or "NM"
+            lines.append(f"{modstr:<6}{row.stars:>5.2f}" + "".join(f"{pp:>9.0f}" for pp in row.pp))
+
+        return "```\n" + "\n".join(lines) + "\n```"
+
+    @commands.command(name="map", aliases=['m', 'beatmap'],
+                      description="pp for a map at a few accuracies and mods")
+    async def map(self, ctx: commands.Context, *, args: str = None) -> None:
+        """pp for a map at 95-100% with NM/HD/HR/DT/HDDT/HDHR.
+        command usage example:
+        - `!map 75`
+        - `!map https://osu.ppy.sh/beatmapsets/1#osu/75`
+        - `!map 75 +HDDT`
+        - `!map 75 +rx!std`
+        """
+        if not args:
+            await ctx.send("usage: `!map <id|link> [+mods]`")
+            return
+
+        try:
+            beatmap_id, mods, mode = self.parse_map_args(args)
+        except ArgumentError as e:
+            await ctx.send(str(e))
+            return
+
+        if beatmap_id is None:
+            await ctx.send("couldn't find a beatmap id or link in that.")
+            return
+
+        try:
+            # NOTE: anything we've downloaded before is answered without the api
+            beatmap = await map_index.get(beatmap_id)
+            if beatmap is None:
+                response = await self.api.get_map_info(map_id=beatmap_id)
+                if response['status'] != 'success':
+                    await ctx.send("beatmap not found.")
+                    return
+
+                beatmap = response['map']
+
+            mode = beatmap['mode'] if mode is None else mode
+
+            beatmap_path, beatmap_md5 = await self.calculator.download_map(beatmap['id'], beatmap['md5'])
+            rows = await calculate_pp_grid(
+                beatmap_path, beatmap_md5, mode,
+                GRID_MODS if mods is None else (mods,)
+            )
+
+        except httpx.HTTPStatusError as e:
+            if e.response.status_code == 404:
+                await ctx.send("beatmap not found.")
+            else:
+                await ctx.send(f"failed to fetch the beatmap: {e}")
+            return
+
+        except Exception as er:
+            log(f"error calculating the pp grid for {beatmap_id}: {er}", Ansi.YELLOW)
+            await ctx.send(f"failed to calculate the beatmap: {er}")
+            return
+
+        minutes, seconds = divmod(beatmap['total_length'], 60)
+        # XXX: the local index has object counts, max combo needs the api
+        combo = (
+            f"{beatmap['max_combo']}x" if 'max_combo' in beatmap
+            else f"{beatmap['circles'] + beatmap['sliders'] + beatmap['spinners']} objects"
+        )
+
+        embed = discord.Embed(
+            description=(
+                f"▸ {rows[0].stars}★ ▸ {beatmap['bpm']:g} BPM ▸ {minutes}:{seconds:02d} ▸ {combo}\n"
+                f"▸ AR {beatmap['ar']:g} ▸ OD {beatmap['od']:g} ▸ CS {beatmap['cs']:g} ▸ HP {beatmap['hp']:g}\n"
+                f"{self.format_grid(rows)}"
+            ),
+            color=0x3498DB
+        )
+        embed.set_author(
+            name=f"{beatmap['artist']} - {beatmap['title']} [{beatmap['version']}] by {beatmap['creator']}",
+            url=f"https://osu.ppy.sh/b/{beatmap['id']}"
+        )
+        embed.set_image(url=f"https://assets.ppy.sh/beatmaps/{beatmap['set_id']}/covers/cover.jpg")
+        embed.set_footer(text=f"{Mode.to_string(mode)} | full combo | on {self.server}")
+
+        await ctx.send(embed=embed)
+
+    @staticmethod
+    def format_result(position: int, beatmap: Dict[str, Any]) -> str:
+        name = f"{beatmap['artist']} - {beatmap['title']} [{beatmap['version']}]"
+        if beatmap['id']:
+            name = f"[{name}](https://osu.ppy.sh/b/{beatmap['id']})"
+
+        minutes, seconds = divmod(beatmap['total_length'], 60)
+        objects = beatmap['circles'] + beatmap['sliders'] + beatmap['spinners']
+
+        return (
+            f"**{position}.** {name} by {beatmap['creator']}\n"
+            f"▸ {MODE_NAMES.get(beatmap['mode'], beatmap['mode'])} ▸ {beatmap['bpm']:g} BPM ▸ {minutes}:{seconds:02d} "
+            f"▸ {objects} objects ▸ AR {beatmap['ar']:g} ▸ OD {beatmap['od']:g} ▸ CS {beatmap['cs']:g}"
+        )
+
+    @commands.command(name="search", aliases=['s'], description="search maps the bot has seen")
+    async def search(self, ctx: commands.Context, *, query: str = None) -> None:
+        """search artist, title, difficulty name, mapper and tags of every map we've downloaded.
+        words match as prefixes and all of them have to match.
+        command usage example:
+        - `!search camellia`
+        - `!search freedom dive four`
+        """
+        if not query:
+            await ctx.send("usage: `!search <artist, title, difficulty or mapper>`")
+            return
+
+        try:
+            results = await map_index.search(query)
+        except Exception as er:
+            log(f"error searching the beatmap index for {query!r}: {er}", Ansi.YELLOW)
+            await ctx.send("search failed, try again later.")
+            return
+
+        if not results:
+            await ctx.send("no maps found, only maps someone has looked up before are searchable.")
+            return
+
+        embed = discord.Embed(
+            description="\n".join(self.format_result(i, beatmap) for i, beatmap in enumerate(results, 1)),
+            color=0x3498DB
+        )
+        embed.set_author(name=f"maps matching \"{query}\"")
+        embed.set_footer(text=f"{len(map_index)} maps indexed | !map <id> for pp")
+
+        await ctx.send(embed=embed)
+
+    async def cog_unload(self):
+        await self.api.close()
+
+async def setup(bot: Bot) -> None:
+    await bot.add_cog(Beatmap(bot))
@@ -0,0 +1,226 @@
+from __future__ import annotations
+
+import discord
+import config
+import httpx
+import asyncio
+import math
+
+from discord.ext import commands
+from typing import TYPE_CHECKING, List, Optional, NamedTuple, Tuple
+from datetime import datetime
+
+from commands.osu.OsuApi.api import ApiClient
+from utils.logging import log, Ansi
+from utils.OsuMapping import Mode
+from utils.cache import TTLCache, MISSING
+from utils.linkHelper import LinkHelper
+
+from objects import glob
+
+if TYPE_CHECKING:
+    from main import Bot
+
+SNAPSHOT_TTL = 60 * 5 # seconds a guild's ranking is served from cache
+MAX_CONCURRENT_FETCHES = 8
+ID_CHUNK_SIZE = 900 # max discord ids per `in (...)` lookup, sqlite < 3.32 stops at 999 parameters
+PAGE_SIZE = 10
+
+class LeaderboardEntry(NamedTuple):
+    discord_id: int
+    name: str
+    pp: int
+    rank: int
+    acc: float
+    plays: int
+
+class Snapshot(NamedTuple):
+    entries: List[LeaderboardEntry]
+    created_at: datetime
+
+class LeaderboardPaginator(discord.ui.View):
+    def __init__(self, cog: Leaderboard, snapshot: Snapshot, guild_name: str, modestr: str):
+        super().__init__(timeout=60)
+        self.cog = cog
+        self.snapshot = snapshot
+        self.guild_name = guild_name
+        self.modestr = modestr
+        self.current_page = 0
+        self.total_pages = max(1, math.ceil(len(snapshot.entries) / PAGE_SIZE))
+        self.message: Optional[discord.Message] = None
+
+        self.update_button_states()
+
+    def get_embed(self) -> discord.Embed:
+        start = self.current_page * PAGE_SIZE
+        lines = [
+            f"**{i}.** {entry.name} (<@{entry.discord_id}>)\n"
+            f"▸ **{entry.pp:,}pp** ▸ #{entry.rank:,} ▸ {entry.acc:.2f}% ▸ {entry.plays:,} plays"
+            for i, entry in enumerate(self.snapshot.entries[start:start + PAGE_SIZE], start + 1)
+        ]
+
+        embed = discord.Embed(
+            title=f"{self.guild_name}'s {self.modestr} leaderboard",
+            description="\n".join(lines),
+            color=0x2ECC71
+        )
+        embed.set_footer(text=f"Page {self.current_page + 1}/{self.total_pages} | on {self.cog.server}")
+        embed.timestamp = self.snapshot.created_at
+
+        return embed
+
+    def update_button_states(self):
+        self.previous_button.disabled = self.current_page == 0
+        self.next_button.disabled = self.current_page >= self.total_pages - 1
+
+    @discord.ui.button(label="←", style=discord.ButtonStyle.gray)
+    async def previous_button(self, interaction: discord.Interaction, button: discord.ui.Button):
+        self.current_page = max(0, self.current_page - 1)
+        self.update_button_states()
+        await interaction.response.edit_message(embed=self.get_embed(), view=self)
+
+    @discord.ui.button(label="→", style=discord.ButtonStyle.gray)
+    async def next_button(self, interaction: discord.Interaction, button: discord.ui.Button):
+        self.current_page = min(self.total_pages - 1, self.current_page + 1)
+        self.update_button_states()
+        await interaction.response.edit_message(embed=self.get_embed(), view=self)
+
+    async def on_timeout(self):
+        if self.message:
+            try:
+                await self.message.edit(view=None)
+            except discord.NotFound:
+                pass
+
+class Leaderboard(commands.Cog):
+    def __init__(self, bot: Bot) -> None:
+        """rank a guild's linked players"""
+        self.bot: Bot = bot
+        self.api = ApiClient()
+        self.server = config.Bancho
+        self.mode = Mode
+        self.snapshots: TTLCache[Tuple[int, int], Snapshot] = TTLCache(maxsize=256, ttl=SNAPSHOT_TTL)
+        self._building: dict[Tuple[int, int], asyncio.Task] = {}
+
+    async def _linked_members(self, guild: discord.Guild) -> List[Tuple[int, str]]:
+        """every linked (discord id, osu! name) in the guild, by primary key"""
+        member_ids = [member.id for member in guild.members if not member.bot]
+        linked: List[Tuple[int, str]] = []
+
+        for i in range(0, len(member_ids), ID_CHUNK_SIZE):
+            chunk = member_ids[i:i + ID_CHUNK_SIZE]
+            rows = await glob.db.fetchall(
+                f"select id, name, mode from users where id in ({', '.join(['%s'] * len(chunk))})",
+                chunk
+            )
+
+            for row in rows:
+                if not row['name']:
+                    continue
+
+                # NOTE: might as well warm the link cache while we're here
+                LinkHelper.osu.set(int(row['id']), (row['name'], row['mode']))
+                linked.append((int(row['id']), row['name']))
+
+        return linked
+
+    async def _fetch_entry(self, discord_id: int, name: str, mode: int,
+                           limit: asyncio.Semaphore) -> Optional[LeaderboardEntry]:
+        async with limit:
+            try:
+                response = await self.api.get_player_info("stats", username=name)
+            except httpx.HTTPStatusError as e:
+                if e.response.status_code != 404: # XXX: linked to a name that doesn't exist anymore
+                    log(f"failed to fetch stats for {name}: {e}", Ansi.YELLOW)
+                return None
+            except httpx.HTTPError as e:
+                log(f"failed to fetch stats for {name}: {e}", Ansi.YELLOW)
+                return None
+            except Exception as e: # NOTE: bad json and the like, one player shouldn't sink the whole board
+                log(f"failed to fetch stats for {name}: {e!r}", Ansi.YELLOW)
+                return None
+
+        try:
+            stats = response.get("player", {}).get("stats", {}).get(str(mode))
+            if not stats or not stats['pp']:
+                return None
+
+            return LeaderboardEntry(
+                discord_id=discord_id,
+                name=name,
+                pp=stats['pp'],
+                rank=stats['rank'],
+                acc=stats['acc'],
+                plays=stats['plays']
+            )
+        except (AttributeError, KeyError, TypeError) as e:
+            log(f"unexpected stats payload for {name}: {e!r}", Ansi.YELLOW)
+            return None
+
+    async def _build_snapshot(self, guild: discord.Guild, mode: int) -> Snapshot:
+        linked = await self._linked_members(guild)
+        limit = asyncio.Semaphore(MAX_CONCURRENT_FETCHES)
+
+        entries = await asyncio.gather(*[
+            self._fetch_entry(discord_id, name, mode, limit)
+            for discord_id, name in linked
+        ])
+
+        snapshot = Snapshot(
+            entries=sorted((entry for entry in entries if entry), key=lambda entry: entry.pp, reverse=True),
+            created_at=datetime.now()
+        )
+        self.snapshots.set((guild.id, mode), snapshot)
+
+        return snapshot
+
+    async def get_snapshot(self, guild: discord.Guild, mode: int) -> Snapshot:
+        key = (guild.id, mode)
+
+        snapshot = self.snapshots.get(key)
+        if snapshot is not MISSING:
+            return snapshot
+
+        # NOTE: if someone is already building this one, wait for theirs
+        task = self._building.get(key)
+        if task is None:
+            task = asyncio.create_task(self._build_snapshot(guild, mode))
+            self._building[key] = task
+            task.add_done_callback(lambda _: self._building.pop(key, None))
+
+        return await asyncio.shield(task)
+
+    @commands.command(name="leaderboard", aliases=['lb', 'rank'],
+                      description="rank this server's linked players")
+    @commands.guild_only()
+    async def leaderboard(self, ctx: commands.Context, *, args: str = None) -> None:
+        """rank this server's linked players by pp.
+        command usage example:
+        - `!lb`
+        - `!lb +rx!std`
+        """
+        mode = self.mode.from_string(args.strip().lstrip('+')) if args else 0
+        modestr = self.mode.to_string(mode)
+
+        try:
+            async with ctx.typing():
+                snapshot = await self.get_snapshot(ctx.guild, mode)
+        except Exception as e:
+            await ctx.send(f"failed to build the leaderboard: {e}")
+            return
+
+        if not snapshot.entries:
+            await ctx.send(f"no linked players with {modestr} stats in this server, link with `!setprofile <username> <mode>`")
+            return
+
+        paginator = LeaderboardPaginator(self, snapshot, ctx.guild.name, modestr)
+        paginator.message = await ctx.send(embed=paginator.get_embed(), view=paginator)
+
+    async def cog_unload(self) -> None:
+        for task in self._building.values():
+            task.cancel()
+
+        await self.api.close()
+
+async def setup(bot: Bot) -> None:
+    await bot.add_cog(Leaderboard(bot))
@@ -13,8 +13,7 @@ from commands.osu.OsuApi.api import ApiClient
 from utils.logging import log
 from utils.OsuMapping import Mode
 from utils.args import ArgParsing
-
-from objects import glob
+from utils.linkHelper import LinkHelper
 
 if TYPE_CHECKING:
     from main import Bot
@@ -27,6 +26,7 @@ class Profile(commands.Cog):
         self.server = config.Bancho
         self.mode = Mode
         self.arg = ArgParsing
+        self.links = LinkHelper()
 
     @commands.command(
         name="setprofile",
@@ -39,20 +39,8 @@ class Profile(commands.Cog):
             return
 
         mode_int = self.mode.from_string(mode)
-        user_id = str(ctx.author.id)
-
-        result = await glob.db.fetch('select * from users where id = %s', [user_id])
-
-        if result:
-            await glob.db.execute(
-                'update users set name = %s, mode = %s where id = %s',
-                [username, mode_int, user_id]
-            )
-        else:
-            await glob.db.execute(
-                'insert into users (id, name, mode) values (%s, %s, %s)',
-                [user_id, username, mode_int]
-            )
+
+        await self.links.set_osu(ctx.author.id, username, mode_int)
 
         await ctx.send(f"profile set for {username} in mode {mode}.")
 
@@ -5,20 +5,32 @@ import config
 import os
 import httpx
 import asyncio
+import hashlib
+import heapq
+import tempfile
+import time
 
+from collections import OrderedDict, deque
 from pathlib import Path
 from discord.ext import commands
-from typing import TYPE_CHECKING, List, Dict, Optional, Literal, NamedTuple, Tuple
-from dataclasses import dataclass
-from datetime import datetime, timedelta
+from typing import TYPE_CHECKING, Any, Callable, Deque, List, Dict, Optional, Literal, NamedTuple, Tuple
+from dataclasses import dataclass, field
+from datetime import datetime
 
 from commands.osu.OsuApi.api import ApiClient
 
 from utils.logging import log, Ansi
 from utils.OsuMapping import Mode, grade_emojis
 from utils.args import ArgParsing
+from utils.cache import TTLCache
 
-from usecases.performance import calculate_performances, ScoreParams, calculate_osu_tools
+from usecases.performance import ScoreParams
+from usecases.performance import calculate_performances_parallel, PerformanceJob
+from usecases.beatmapcache import beatmap_files
+from usecases.packstore import pack_store
+from usecases.mapindex import map_index
+from usecases.executor import pp_pool
+from usecases.comparison import Comparison, calculate_bancho, compare_performances, combine
 
 if TYPE_CHECKING:
     from main import Bot
@@ -34,18 +46,38 @@ class ScoreSession:
     username: str
     player_id: int
     message: Optional[discord.Message]
-    last_interaction: datetime
     command_type: Literal["recent", "top"]
-    
-    @property
-    def is_expired(self) -> bool:
-        return (datetime.now() - self.last_interaction) > timedelta(minutes=1)
+    compare: bool = False
+    prefetch: Optional[asyncio.Task] = None
+    view: Optional[discord.ui.View] = None
+    # NOTE: time.monotonic(), set and moved by SessionStore
+    expires_at: float = 0.0
+    # NOTE: page -> rendered embed, and renders still in flight
+    embeds: Dict[int, discord.Embed] = field(default_factory=dict)
+    rendering: Dict[int, asyncio.Task] = field(default_factory=dict)
 
 class MapCalculation(NamedTuple):
     pp: float
     stars: float
     pp_if_fc: float
-    #pp_bancho: float
+    # NOTE: only set in comparison mode, None there means osu-tools didn't make it in time
+    pp_bancho: Optional[float] = None
+    compared: bool = False
+
+    @property
+    def settled(self) -> bool:
+        """False while the bancho side is missing, osu-tools may still land it"""
+        return not self.compared or self.pp_bancho is not None
+
+class RenderedPage(NamedTuple):
+    embed: discord.Embed
+    # NOTE: unsettled pages aren't memoized, the next render picks up late osu-tools results
+    settled: bool
+
+class DownloadedMap(NamedTuple):
+    path: str
+    # NOTE: what the file actually hashes to, not always the md5 that was asked for
+    md5: str
 
 # --- Helper Functions ---
 class ScoreUtils:
@@ -76,12 +108,20 @@ class ScoreUtils:
                     f"▸ HD Remover: {'Yes' if score['hdr'] > 0 else 'Not used'}"
                 )
 
+        bancho = ""
+        if calc.compared:
+            if calc.pp_bancho is not None:
+                bancho = f"▸ bancho: {calc.pp_bancho}pp if FC (refx {calc.pp_if_fc - calc.pp_bancho:+.2f}pp)\n"
+            else:
+                bancho = "▸ bancho: timed out\n"
+
         # play_time
         unix_playtime = datetime.fromisoformat(score['play_time']).timestamp()
 
         return {
             'title': f"{beatmap['artist']} - {beatmap['title']} [{beatmap['version']}]",
-            'pp_display': f"{round(score['pp'], 2)}pp{fcstr}", # (bancho: {calc.pp_bancho}pp)
+            'pp_display': f"{round(score['pp'], 2)}pp{fcstr}",
+            'bancho': bancho,
             'accuracy': f"{float(score['acc']):.2f}%",
             'combo': f"{score['max_combo']}x/{beatmap['max_combo']}x",
             'hits': f"[{score['n300']}/{score['n100']}/{score['n50']}/{score['nmiss']}]",
@@ -102,27 +142,108 @@ class ScoreUtils:
 class BeatmapCalculator:
     CACHE_DIR = Path(".data")
 
+    # NOTE: shared by every instance, one keep-alive pool to osu.ppy.sh
+    #       and at most one download per md5 at a time
+    http: Optional[httpx.AsyncClient] = None
+    inflight: Dict[str, asyncio.Task] = {}
+    # outdated md5 -> md5 of what osu.ppy.sh serves now
+    replaced: TTLCache[str, str] = TTLCache(maxsize=1024, ttl=60 * 60)
+
     def __init__(self):
         self.CACHE_DIR.mkdir(exist_ok=True)
 
-    async def download_map(self, beatmap_id: int, beatmap_md5: str) -> str:
-        """download and cache beatmap file."""
-        filepath = self.CACHE_DIR / f"{beatmap_md5}.osu"
-        
-        if not filepath.exists():
-            async with httpx.AsyncClient() as client:
-                response = await client.get(f"https://osu.ppy.sh/osu/{beatmap_id}")
-                if response.status_code != 200:
-                    raise Exception(f"Failed to download beatmap with id {beatmap_id}")
-                filepath.write_bytes(response.content)
+    @classmethod
+    def client(cls) -> httpx.AsyncClient:
+        if cls.http is None or cls.http.is_closed:
+            cls.http = httpx.AsyncClient(
+                base_url="https://osu.ppy.sh",
+                timeout=15.0,
+                follow_redirects=True,
+                limits=httpx.Limits(max_connections=16, max_keepalive_connections=8)
+            )
 
-        return str(filepath)
+        return cls.http
 
-    async def calculate_map_stats(self, score: Dict, beatmap: Dict) -> MapCalculation:
-        """calculate map statistics if fc including PP and stars."""
-        beatmap_path = await self.download_map(beatmap['id'], beatmap['md5'])
-        
-        score_params = ScoreParams(
+    @classmethod
+    async def close(cls) -> None:
+        if cls.http is not None:
+            await cls.http.aclose()
+            cls.http = None
+
+    async def download_map(self, beatmap_id: int, beatmap_md5: str) -> DownloadedMap:
+        """
+        download and cache beatmap file.
+
+        key anything derived from the file by the returned md5, an updated map
+        comes back under its new one.
+        """
+        md5 = self.replaced.get(beatmap_md5, beatmap_md5)
+
+        if pack_store is not None:
+            if md5 in pack_store:
+                return DownloadedMap(pack_store.ref(md5), md5)
+        else:
+            filepath = self.CACHE_DIR / f"{md5}.osu"
+
+            # NOTE: the index knows what's on disk, no need to stat
+            if beatmap_files.touch(md5) or (not beatmap_files.loaded and filepath.exists()):
+                return DownloadedMap(str(filepath), md5)
+
+        task = self.inflight.get(beatmap_md5)
+        if task is None:
+            task = asyncio.create_task(self._download(beatmap_id, beatmap_md5))
+            self.inflight[beatmap_md5] = task
+            task.add_done_callback(lambda _: self.inflight.pop(beatmap_md5, None))
+
+        # NOTE: shielded so one impatient caller can't cancel everyone's download
+        return await asyncio.shield(task)
+
+    async def _download(self, beatmap_id: int, beatmap_md5: str) -> DownloadedMap:
+        response = await self.client().get(f"/osu/{beatmap_id}")
+        if response.status_code != 200:
+            raise Exception(f"Failed to download beatmap with id {beatmap_id}")
+
+        content = response.content
+        actual_md5 = hashlib.md5(content).hexdigest()
+
+        if actual_md5 != beatmap_md5:
+            # NOTE: nothing to verify against anymore, at least make sure it's a whole map
+            if not content.startswith(b"osu file format") or b"[HitObjects]" not in content:
+                raise Exception(f"Downloaded beatmap {beatmap_id} is corrupt")
+
+            # XXX: the map got updated since the score was set, cache it under
+            #      what it actually is so the old md5 never points at it
+            log(f"beatmap {beatmap_id} md5 mismatch: expected {beatmap_md5}, got {actual_md5}", Ansi.YELLOW)
+            self.replaced.set(beatmap_md5, actual_md5)
+
+        map_index.submit(actual_md5, content)
+
+        if pack_store is not None:
+            await asyncio.to_thread(pack_store.add, content)
+            return DownloadedMap(pack_store.ref(actual_md5), actual_md5)
+
+        filepath = self.CACHE_DIR / f"{actual_md5}.osu"
+        await asyncio.to_thread(self._write_atomic, filepath, content)
+        beatmap_files.add(actual_md5, len(content))
+
+        return DownloadedMap(str(filepath), actual_md5)
+
+    @staticmethod
+    def _write_atomic(filepath: Path, content: bytes) -> None:
+        """write to a temp file next to the target, then rename over it."""
+        fd, tmp_path = tempfile.mkstemp(dir=filepath.parent, prefix=".", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(content)
+            os.replace(tmp_path, filepath)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    @staticmethod
+    def score_params(score: Dict, beatmap: Dict) -> ScoreParams:
+        """pp if fc parameters for a score."""
+        return ScoreParams(
             mode=score['mode'],
             mods=score['mods'],
             combo=beatmap['max_combo'],
@@ -136,27 +257,155 @@ class BeatmapCalculator:
             CS=score['cs'],
             HD=score['hdr']
         )
-        
-        calc = calculate_performances(beatmap_path, [score_params])[0]
-        #bancho_calc = calculate_osu_tools(beatmap_path, [score_params], "/home/ano/discord-bot/osu-tools")[0] # god..
-        
+
+    @staticmethod
+    def played_params(score: Dict) -> ScoreParams:
+        """parameters of the score as it was actually played."""
+        return ScoreParams(
+            mode=score['mode'],
+            mods=score['mods'],
+            combo=score['max_combo'],
+            acc=score['acc'],
+            n300=score['n300'],
+            n100=score['n100'],
+            n50=score['n50'],
+            ngeki=score.get('ngeki'),
+            nkatu=score.get('nkatu'),
+            nmiss=score['nmiss'],
+
+            # NOTE: for refx
+            AC=score['aim_value'],
+            AR=score['ar_value'],
+            TW=score['twval'],
+            CS=score['cs'],
+            HD=score['hdr']
+        )
+
+    @staticmethod
+    def to_map_calculation(score: Dict, calc: Dict) -> MapCalculation:
         return MapCalculation(
             pp=round(score['pp'], 2),
             stars=round(float(calc['difficulty']['stars']), 2),
             pp_if_fc=round(calc['performance']['pp'], 2),
-            #pp_bancho=round(bancho_calc['performance']['pp'], 2)
         )
 
+    @staticmethod
+    def to_compared_calculation(score: Dict, comparison: Comparison) -> MapCalculation:
+        return MapCalculation(
+            pp=round(score['pp'], 2),
+            stars=comparison.stars,
+            pp_if_fc=comparison.pp,
+            pp_bancho=comparison.pp_bancho,
+            compared=True
+        )
+
+    async def calculate_map_stats(self, score: Dict, beatmap: Dict, compare: bool = False) -> MapCalculation:
+        """calculate map statistics if fc including PP and stars."""
+        return (await self.calculate_many_map_stats([{**score, 'beatmap': beatmap}], compare))[0]
+
+    async def calculate_many_map_stats(self, scores: List[Dict], compare: bool = False) -> List[MapCalculation]:
+        """calculate_map_stats for a whole page at once, each map parsed once, maps in parallel."""
+        downloaded = await asyncio.gather(*[
+            self.download_map(score['beatmap']['id'], score['beatmap']['md5'])
+            for score in scores
+        ])
+
+        jobs = [
+            PerformanceJob(path, md5, self.score_params(score, score['beatmap']))
+            for (path, md5), score in zip(downloaded, scores)
+        ]
+
+        # NOTE: osu-tools runs next to refx on its own workers, refx never waits for it
+        if compare:
+            comparisons = await compare_performances(jobs)
+            return [self.to_compared_calculation(score, comparison) for score, comparison in zip(scores, comparisons)]
+
+        # NOTE: cpu bound, runs on pp_pool unless it's already in pp_cache
+        calcs = await calculate_performances_parallel(jobs)
+
+        return [self.to_map_calculation(score, calc) for score, calc in zip(scores, calcs)]
+
+# --- Prefetcher ---
+class BeatmapPrefetcher:
+    def __init__(self, calculator: BeatmapCalculator, concurrency: int = 4):
+        """
+        downloads and pre-calculates the pages of a top session nobody looked at yet,
+        so flipping pages is served from .data and pp_cache instead of osu.ppy.sh.
+        """
+        self.calculator = calculator
+        self.slots = asyncio.Semaphore(concurrency)
+
+        self.started: int = 0
+        self.completed: int = 0
+        self.cancelled: int = 0
+        self.maps: int = 0
+        self.pages: int = 0
+        self.failed: int = 0
+
+    def start(self, session: ScoreSession) -> None:
+        session.prefetch = asyncio.create_task(self._run(session))
+
+    @staticmethod
+    def cancel(session: ScoreSession) -> None:
+        if session.prefetch is not None and not session.prefetch.done():
+            session.prefetch.cancel()
+
+    async def _download(self, score: Dict) -> None:
+        async with self.slots:
+            await self.calculator.download_map(score['beatmap']['id'], score['beatmap']['md5'])
+
+    async def _run(self, session: ScoreSession) -> None:
+        self.started += 1
+
+        try:
+            for index in range(session.current_page + 1, len(session.pages)):
+                page = session.pages[index]
+                results = await asyncio.gather(*[self._download(score) for score in page], return_exceptions=True)
+                failed = sum(isinstance(result, Exception) for result in results)
+
+                self.maps += len(results) - failed
+                self.failed += failed
+
+                # XXX: already rendered or being rendered, that calculated it too
+                if failed or index in session.embeds or index in session.rendering:
+                    continue
+
+                # NOTE: low priority, let whoever is waiting on the pool go first
+                while pp_pool.waiting:
+                    await asyncio.sleep(0.25)
+
+                try:
+                    await self.calculator.calculate_many_map_stats(page, session.compare)
+                    self.pages += 1
+                except Exception as e:
+                    self.failed += 1
+                    log(f"failed to prefetch a page for {session.username}: {e}", Ansi.YELLOW)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+
+        self.completed += 1
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'started': self.started,
+            'completed': self.completed,
+            'cancelled': self.cancelled,
+            'maps': self.maps,
+            'pages': self.pages,
+            'failed': self.failed,
+        }
+
 # --- Score Embed ---
 class ScoreEmbed:
     def __init__(self, server: str):
         self.server = server
         self.calculator = BeatmapCalculator()
 
-    async def create_single_score_embed(self, score: Dict, username: str, player_id: int) -> discord.Embed:
+    async def create_single_score_embed(self, score: Dict, username: str, player_id: int, compare: bool = False) -> RenderedPage:
         """recent command."""
         beatmap = score['beatmap']
-        calc = await self.calculator.calculate_map_stats(score, beatmap)
+        calc = await self.calculator.calculate_map_stats(score, beatmap, compare)
         details = ScoreUtils.fmt_score_details(score, beatmap, calc)
         scoreset = f"▸ score set: {details['scoreset']}\n" if score['grade'] != 'F' else ''
         
@@ -164,6 +413,7 @@ class ScoreEmbed:
             description=(
                 f"▸ {grade_emojis.get(score['grade'], score['grade'])} "
                 f"▸ **{details['pp_display']}** ▸ {details['accuracy']}\n"
+                f"{details['bancho']}"
                 f"▸ {details['score_display']} ▸ {details['combo']} ▸ {details['hits']}\n"
                 f"{scoreset}"
                 f"{details['cheatval']} " # NOTE: only for refx
@@ -182,7 +432,7 @@ class ScoreEmbed:
         embed.set_image(url=f"https://assets.ppy.sh/beatmaps/{beatmap['set_id']}/covers/cover.jpg")
         embed.set_footer(text=f"on {self.server}")
         
-        return embed
+        return RenderedPage(embed, calc.settled)
 
     async def create_multi_score_embed(
         self,
@@ -190,20 +440,22 @@ class ScoreEmbed:
         username: str,
         player_id: int,
         current_page: int,
-        total_pages: int
-    ) -> discord.Embed:
+        total_pages: int,
+        compare: bool = False
+    ) -> RenderedPage:
         """top command."""
         embed = discord.Embed(title=f"Top plays for {username}", color=0x2ECC71)
+        calcs = await self.calculator.calculate_many_map_stats(scores, compare)
         
-        for i, score in enumerate(scores, 1):
+        for i, (score, calc) in enumerate(zip(scores, calcs), 1):
             beatmap = score['beatmap']
-            calc = await self.calculator.calculate_map_stats(score, beatmap)
             details = ScoreUtils.fmt_score_details(score, beatmap, calc)
             scoreset = f"▸ score set: {details['scoreset']}\n" if score['grade'] != 'F' else ''
             
             value = (
                 f"▸ {grade_emojis.get(score['grade'], score['grade'])} "
                 f"▸ **{details['pp_display']}** ▸ {details['accuracy']}\n"
+                f"{details['bancho']}"
                 f"▸ {details['score_display']} ▸ {details['combo']} ▸ {details['hits']}\n"
                 f"▸ {details['mods']} ▸ {details['stars']}\n"
                 f"{scoreset}"
@@ -220,12 +472,222 @@ class ScoreEmbed:
         embed.set_footer(text=f"Page {current_page + 1}/{total_pages} | on {self.server}")
         embed.set_thumbnail(url=f"https://a.{self.server}/{player_id}")
         
+        return RenderedPage(embed, all(calc.settled for calc in calcs))
+
+    def create_comparison_embed(self, score: Dict, comparison: Comparison, pending: bool) -> discord.Embed:
+        """compare command."""
+        beatmap = score['beatmap']
+
+        if comparison.pp_bancho is not None:
+            bancho = f"**{comparison.pp_bancho}pp** ▸ {comparison.stars_bancho}★"
+            delta = f"▸ delta: {comparison.delta:+.2f}pp\n"
+        else:
+            bancho = "calculating..." if pending else "timed out"
+            delta = ""
+
+        embed = discord.Embed(
+            description=(
+                f"▸ refx: **{comparison.pp}pp** ▸ {comparison.stars}★\n"
+                f"▸ osu-tools: {bancho}\n"
+                f"{delta}"
+                f"▸ server: {round(score['pp'], 2)}pp ▸ {float(score['acc']):.2f}% ▸ {score['max_combo']}x ▸ {score['nmiss']} miss\n"
+            ),
+            color=0x3498DB
+        )
+        embed.set_author(
+            name=f"{beatmap['artist']} - {beatmap['title']} [{beatmap['version']}] +{score['mods_readable']}",
+            url=f"https://osu.ppy.sh/b/{beatmap['id']}"
+        )
+        embed.set_footer(text=f"refx_pp_py vs osu-tools | on {self.server}")
+
         return embed
 
+# --- Session Store ---
+class SessionStore:
+    def __init__(self, release: Callable[[ScoreSession], None], ttl: float = 60.0,
+                 max_sessions: int = 500, unview_rate: float = 5.0) -> None:
+        """
+        live paginated sessions by message id, least recently used first.
+
+        expiry is a heap of (deadline, message id) and the loop sleeps until the
+        earliest one, nothing is ever scanned. a button press only moves the
+        session's deadline, its old heap entry gets pushed back when it comes up.
+        past `max_sessions` the least recently used session expires early.
+
+        expired messages lose their buttons through one worker doing at most
+        `unview_rate` edits a second, a burst of expiries waits its turn. until
+        then the view stays registered and its buttons answer "expired".
+        """
+        self.release = release
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self.unview_rate = unview_rate
+
+        self.sessions: OrderedDict[int, ScoreSession] = OrderedDict()
+        self.deadlines: List[Tuple[float, int]] = []
+        self.unview: asyncio.Queue[Tuple[discord.Message, Optional[discord.ui.View]]] = asyncio.Queue()
+        # NOTE: views of messages that never got edited, still answering "expired"
+        self.lingering: Deque[discord.ui.View] = deque()
+        self._wakeup = asyncio.Event()
+        self._tasks: List[asyncio.Task] = []
+
+        self.expired: int = 0
+        self.evicted: int = 0
+        self.unviewed: int = 0
+        self.unview_skipped: int = 0
+
+    def __len__(self) -> int:
+        return len(self.sessions)
+
+    def get(self, message_id: int) -> Optional[ScoreSession]:
+        return self.sessions.get(message_id)
+
+    def add(self, message_id: int, session: ScoreSession) -> None:
+        session.expires_at = time.monotonic() + self.ttl
+        self.sessions[message_id] = session
+        heapq.heappush(self.deadlines, (session.expires_at, message_id))
+
+        # NOTE: every new deadline is the latest one, the loop only needs a nudge when it had nothing to wait for
+        if len(self.deadlines) == 1:
+            self._wakeup.set()
+
+        while len(self.sessions) > self.max_sessions:
+            _, oldest = self.sessions.popitem(last=False)
+            self._expire(oldest)
+            self.evicted += 1
+
+    def touch(self, message_id: int) -> None:
+        session = self.sessions.get(message_id)
+        if session is not None:
+            session.expires_at = time.monotonic() + self.ttl
+            self.sessions.move_to_end(message_id)
+
+    def _expire(self, session: ScoreSession) -> None:
+        self.release(session)
+
+        if session.message is None:
+            if session.view is not None:
+                session.view.stop()
+            return
+
+        # XXX: past this the edits would lag minutes behind, the buttons just answer "expired".
+        #      those views can't stay registered forever though, the oldest goes past max_sessions
+        if self.unview.qsize() >= self.max_sessions:
+            self.unview_skipped += 1
+            if session.view is not None:
+                self.lingering.append(session.view)
+                if len(self.lingering) > self.max_sessions:
+                    self.lingering.popleft().stop()
+        else:
+            self.unview.put_nowait((session.message, session.view))
+
+    def expire_due(self) -> int:
+        """expire everything past its deadline in one go"""
+        now = time.monotonic()
+        expired = 0
+
+        while self.deadlines and self.deadlines[0][0] <= now:
+            _, message_id = heapq.heappop(self.deadlines)
+            session = self.sessions.get(message_id)
+
+            if session is None: # NOTE: evicted, the entry outlived it
+                continue
+
+            if session.expires_at > now:
+                heapq.heappush(self.deadlines, (session.expires_at, message_id))
+                continue
+
+            del self.sessions[message_id]
+            self._expire(session)
+            expired += 1
+
+        self.expired += expired
+        return expired
+
+    def start(self) -> None:
+        if not self._tasks:
+            self._tasks = [asyncio.create_task(self._run()), asyncio.create_task(self._unview())]
+
+    async def close(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+
+        # NOTE: no edits on the way out, but the views have no timeout. this also runs on a
+        #       cog reload, and a view left registered would keep routing presses to the old cog
+        for session in self.sessions.values():
+            self.release(session)
+            if session.view is not None:
+                session.view.stop()
+
+        while not self.unview.empty():
+            _, view = self.unview.get_nowait()
+            if view is not None:
+                view.stop()
+
+        for view in self.lingering:
+            view.stop()
+
+        self.sessions.clear()
+        self.deadlines.clear()
+        self.lingering.clear()
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                if not self.deadlines:
+                    self._wakeup.clear()
+                    await self._wakeup.wait()
+                    continue
+
+                delay = self.deadlines[0][0] - time.monotonic()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                    continue
+
+                self.expire_due()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                log(f"error expiring score sessions: {e}", Ansi.YELLOW)
+                await asyncio.sleep(1)
+
+    async def _unview(self) -> None:
+        while True:
+            message, view = await self.unview.get()
+
+            try:
+                await message.edit(view=None)
+                self.unviewed += 1
+            except discord.NotFound:
+                pass
+            except discord.HTTPException as e:
+                log(f"failed to remove buttons from an expired score message: {e}", Ansi.YELLOW)
+            finally:
+                # NOTE: only now, until the edit went through a press still gets the "expired" reply
+                if view is not None:
+                    view.stop()
+
+            await asyncio.sleep(1 / self.unview_rate)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'live': len(self.sessions),
+            'max_sessions': self.max_sessions,
+            'heap': len(self.deadlines),
+            'expired': self.expired,
+            'evicted': self.evicted,
+            'unview_queued': self.unview.qsize(),
+            'unviewed': self.unviewed,
+            'unview_skipped': self.unview_skipped,
+            'lingering': len(self.lingering),
+        }
+
 # --- Score Paginator ---
 class ScorePaginator(discord.ui.View):
     def __init__(self, cog: Score, message_id: int):
-        super().__init__(timeout=60)
+        # NOTE: no timeout, SessionStore expires sessions and stops their views once the buttons are gone
+        super().__init__(timeout=None)
         self.cog = cog
         self.message_id = message_id
 
@@ -240,44 +702,30 @@ class ScorePaginator(discord.ui.View):
     async def handle_pagination(self, interaction: discord.Interaction, direction: str):
         session = self.cog.sessions.get(self.message_id)
         if not session:
+            await interaction.response.send_message("these scores expired, run the command again.", ephemeral=True)
             return
 
-        if direction == "previous":
-            session.current_page = max(0, session.current_page - 1)
-        else:
-            session.current_page = min(len(session.pages) - 1, session.current_page + 1)
+        step = -1 if direction == "previous" else 1
+        session.current_page = max(0, min(len(session.pages) - 1, session.current_page + step))
         
-        session.last_interaction = datetime.now()
+        self.cog.sessions.touch(self.message_id)
         
         try:
-            if session.command_type == "top":
-                embed = await self.cog.embed_creator.create_multi_score_embed(
-                    session.pages[session.current_page],
-                    session.username,
-                    session.player_id,
-                    session.current_page,
-                    len(session.pages)
-                )
-            else:
-                embed = await self.cog.embed_creator.create_single_score_embed(
-                    session.pages[session.current_page][0],
-                    session.username,
-                    session.player_id
-                )
-                
+            embed = await self.cog.render_page(session, session.current_page)
             await interaction.response.edit_message(embed=embed)
+        except asyncio.CancelledError:
+            # XXX: the session expired mid-render and release() cancelled it, the press still needs an answer
+            if self.cog.sessions.get(self.message_id) is session:
+                raise
+            await interaction.response.send_message("these scores expired, run the command again.", ephemeral=True)
+            return
         except Exception as e:
             log(f"error in pagination: {e}", Ansi.YELLOW)
             await interaction.response.send_message("an error occurred while updating the scores.", ephemeral=True)
+            return
 
-    async def on_timeout(self):
-        session = self.cog.sessions.get(self.message_id)
-        if session and session.message:
-            try:
-                await session.message.edit(view=None)
-            except discord.NotFound:
-                pass
-            self.cog.sessions.pop(self.message_id, None)
+        # NOTE: they'll most likely keep going the same way
+        self.cog.speculate(session, session.current_page + step)
 
 # --- Main Score Cog ---
 class Score(commands.Cog):
@@ -287,35 +735,96 @@ class Score(commands.Cog):
         self.server = config.Bancho
         self.mode = Mode
         self.arg = ArgParsing
-        self.sessions: Dict[int, ScoreSession] = {}
         self.embed_creator = ScoreEmbed(self.server)
+        self.prefetcher = BeatmapPrefetcher(self.embed_creator.calculator)
         self.player_id: Optional[int] = None
-        
-        self.cleanup_task = bot.loop.create_task(self._cleanup_sessions())
 
-    def cog_unload(self):
-        self.cleanup_task.cancel()
+        self.page_hits: int = 0
+        self.page_renders: int = 0
+        self.page_speculated: int = 0
 
-    async def _cleanup_sessions(self):
-        while True:
-            try:
-                await asyncio.sleep(60)
-                expired_sessions = [
-                    message_id for message_id, session in self.sessions.items()
-                    if session.is_expired
-                ]
-                
-                for message_id in expired_sessions:
-                    session = self.sessions.pop(message_id)
-                    if session.message:
-                        try:
-                            await session.message.edit(view=None)
-                        except discord.NotFound:
-                            pass
-            except asyncio.CancelledError:
-                break
-            except Exception as e:
-                log(f"error in session cleanup: {e}", Ansi.YELLOW)
+        self.sessions = SessionStore(
+            self.release,
+            ttl=config.score_session_ttl,
+            max_sessions=config.score_sessions_max,
+            unview_rate=config.score_unview_rate
+        )
+        self.sessions.start()
+
+    async def cog_unload(self):
+        await self.sessions.close()
+        await BeatmapCalculator.close()
+
+    def release(self, session: ScoreSession) -> None:
+        """stop background work for a session and drop its rendered pages."""
+        self.prefetcher.cancel(session)
+
+        for task in session.rendering.values():
+            task.cancel()
+
+        session.rendering.clear()
+        session.embeds.clear()
+
+    async def _render(self, session: ScoreSession, page: int) -> discord.Embed:
+        if session.command_type == "top":
+            rendered = await self.embed_creator.create_multi_score_embed(
+                session.pages[page],
+                session.username,
+                session.player_id,
+                page,
+                len(session.pages),
+                session.compare
+            )
+        else:
+            rendered = await self.embed_creator.create_single_score_embed(
+                session.pages[page][0],
+                session.username,
+                session.player_id,
+                session.compare
+            )
+
+        if rendered.settled:
+            session.embeds[page] = rendered.embed
+        return rendered.embed
+
+    def _render_task(self, session: ScoreSession, page: int) -> asyncio.Task:
+        task = session.rendering.get(page)
+        if task is None:
+            self.page_renders += 1
+            task = asyncio.create_task(self._render(session, page))
+            session.rendering[page] = task
+
+            def done(task: asyncio.Task) -> None:
+                session.rendering.pop(page, None)
+                if not task.cancelled() and task.exception() is not None:
+                    log(f"failed to render page {page + 1} for {session.username}: {task.exception()}", Ansi.YELLOW)
+
+            task.add_done_callback(done)
+
+        return task
+
+    async def render_page(self, session: ScoreSession, page: int) -> discord.Embed:
+        """rendered embed for a page, memoized per session once it's settled."""
+        embed = session.embeds.get(page)
+        if embed is not None:
+            self.page_hits += 1
+            return embed
+
+        # NOTE: shielded, a speculative render we join shouldn't die with this interaction
+        return await asyncio.shield(self._render_task(session, page))
+
+    def speculate(self, session: ScoreSession, page: int) -> None:
+        """render a page in the background before anyone asks for it."""
+        if 0 <= page < len(session.pages) and page not in session.embeds and page not in session.rendering:
+            self.page_speculated += 1
+            self._render_task(session, page)
+
+    def page_stats(self) -> Dict[str, int]:
+        return {
+            'hits': self.page_hits,
+            'renders': self.page_renders,
+            'speculated': self.page_speculated,
+        }
 
     async def _handle_score_command(
         self,
@@ -325,51 +834,64 @@ class Score(commands.Cog):
         page_size: int
     ) -> None:
         """handle both recent and top score commands."""
-        username, mode = await self.arg.parse_args(self, ctx, args)
-        if username is None or mode is None:
+        parsed = await self.arg.resolve(ctx, args)
+        if parsed is None:
             return
 
+        username, mode, compare = parsed.username, parsed.mode, parsed.compare
+
         try:
             response = await self.api.get_player_scores(command_type, username=username, mode_arg=mode)
             if response['status'] != 'success':
                 await ctx.send("failed to fetch scores.")
                 return
 
-            scores = response['scores']
+            scores = parsed.apply(response['scores'])
             if not scores:
-                await ctx.send(f"no {command_type} scores found.")
+                await ctx.send(
+                    f"no {command_type} scores match that." if parsed.narrowed and response['scores']
+                    else f"no {command_type} scores found."
+                )
                 return
 
             self.player_id = response['player']['id']
 
             pages = ScoreUtils.create_pages(scores, page_size)
+            page = min(parsed.page, len(pages) - 1)
             
             if command_type == "best":
-                embed = await self.embed_creator.create_multi_score_embed(
-                    pages[0], username, self.player_id, 0, len(pages)
+                rendered = await self.embed_creator.create_multi_score_embed(
+                    pages[page], username, self.player_id, page, len(pages), compare
                 )
             else:
-                embed = await self.embed_creator.create_single_score_embed(
-                    pages[0][0], username, self.player_id
+                rendered = await self.embed_creator.create_single_score_embed(
+                    pages[page][0], username, self.player_id, compare
                 )
 
             message = await ctx.send(
                 f"{command_type.title()} score{'s' if command_type == 'best' else ''} for {response['player']['name']}:",
-                embed=embed
+                embed=rendered.embed
             )
             
             view = ScorePaginator(self, message.id)
             await message.edit(view=view)
 
-            self.sessions[message.id] = ScoreSession(
+            session = ScoreSession(
                 pages=pages,
-                current_page=0,
+                current_page=page,
                 username=username,
                 player_id=self.player_id,
                 message=message,
-                last_interaction=datetime.now(),
-                command_type="top" if command_type == "best" else "recent"
+                command_type="top" if command_type == "best" else "recent",
+                compare=compare,
+                view=view
             )
+            if rendered.settled:
+                session.embeds[page] = rendered.embed
+            self.sessions.add(message.id, session)
+
+            if session.command_type == "top" and len(pages) > 1:
+                self.prefetcher.start(session)
 
         except httpx.HTTPStatusError as e:
             if e.response.status_code == 404: # XXX: might be wrong username?
@@ -386,6 +908,8 @@ class Score(commands.Cog):
         - `!r ano +rx!std`
         - `!r @rieki +vn!ctb`
         - `!r +vn!std`
+        - `!r ano +rx!std -c` (compare with osu-tools)
+        - `!r ano +HD acc>=98 -p 2` (2nd most recent HD score at 98%+)
         """
         await self._handle_score_command(ctx, args, "recent", 1)
 
@@ -397,8 +921,62 @@ class Score(commands.Cog):
         - `!t ano +ap!std`
         - `!t +rx!std`
         - `!t @nipa +vn!std`
+        - `!t ano +rx!std -c` (compare with osu-tools)
+        - `!t ano +HDDT -s acc` (HDDT scores, best accuracy first)
+        - `!t ano miss=0 -p 3`
         """
         await self._handle_score_command(ctx, args, "best", 5)
 
+    @commands.command(name="compare", aliases=['cmp'],
+                      description="compare refx and osu-tools pp for a player's most recent score")
+    async def compare(self, ctx: commands.Context, *, args: str = None) -> None:
+        """compare refx and osu-tools (bancho) pp for a player's most recent score.
+        command usage example: 
+        - `!cmp ano +rx!std`
+        - `!cmp @rieki`
+        """
+        username, mode = await self.arg.parse_args(self, ctx, args)
+        if username is None or mode is None:
+            return
+
+        try:
+            response = await self.api.get_player_scores("recent", username=username, mode_arg=mode)
+            if response['status'] != 'success' or not response['scores']:
+                await ctx.send("no recent scores found.")
+                return
+
+            score = response['scores'][0]
+            beatmap = score['beatmap']
+            calculator = self.embed_creator.calculator
+
+            beatmap_path, beatmap_md5 = await calculator.download_map(beatmap['id'], beatmap['md5'])
+            job = PerformanceJob(beatmap_path, beatmap_md5, calculator.played_params(score))
+
+            # NOTE: osu-tools starts right away, but refx goes on screen without waiting for it
+            bancho = asyncio.create_task(calculate_bancho(job, config.osu_tools_timeout))
+            try:
+                refx = (await calculate_performances_parallel([job]))[0]
+
+                pending = not bancho.done()
+                message = await ctx.send(embed=self.embed_creator.create_comparison_embed(
+                    score, combine(refx, None if pending else bancho.result()), pending
+                ))
+
+                if pending:
+                    await message.edit(embed=self.embed_creator.create_comparison_embed(
+                        score, combine(refx, await bancho), False
+                    ))
+            finally:
+                # XXX: refx or discord failed, nobody is going to read it (a late result still reaches bancho_cache)
+                if not bancho.done():
+                    bancho.cancel()
+
+        except httpx.HTTPStatusError as e:
+            if e.response.status_code == 404: # XXX: might be wrong username?
+                await ctx.send(f"{username} not found in {self.server}")
+
+        except Exception as er:
+            await ctx.send(f"failed to compare scores: {er}")
+
 async def setup(bot: Bot) -> None:
     await bot.add_cog(Score(bot))
\ No newline at end of file
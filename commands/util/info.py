@@ -9,9 +9,11 @@ from typing import TYPE_CHECKING
 
 import config
 import random
-import os
 import sys
 
+from usecases.beatmapcache import beatmap_files
+from usecases.packstore import pack_store
+
 if TYPE_CHECKING:
     from main import Bot
 
@@ -47,11 +49,15 @@ class Info(commands.Cog):
         for i, usage in enumerate(cpu_usage, start=1):
             info += f"CPU core {i}: {usage}%\n"
 
-        data_path = ".data"
+        if pack_store is not None:
+            pack_stats = pack_store.stats()
+            cached = f"{pack_stats['count']} ({pack_stats['bytes'] / 1024 ** 2:.1f} MB packed)"
+        else:
+            cached = f"{len(beatmap_files)} ({beatmap_files.bytes / 1024 ** 2:.1f} MB)"
 
         info += (
             f"\nservers: {len(ctx.bot.guilds)}\n"
-            f"beatmaps cached: {len([file for file in os.listdir(data_path) if os.path.isfile(os.path.join(data_path, file))])}\n"
+            f"beatmaps cached: {cached}\n"
             f"bot latency: {round(self.bot.latency * 1000, 2)}ms\n"
             f"discord.py version: [{discord.__version__}](https://github.com/Rapptz/discord.py)\n"
             f"python version: [{sys.version_info.major}.{sys.version_info.minor}.{sys.version_info.micro}](https://www.python.org/)\n"
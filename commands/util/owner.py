@@ -17,6 +17,17 @@ from typing import Optional
 
 from datetime import datetime
 from utils.logging import log, Ansi
+from utils.prefixHelper import PrefixHelper
+from utils.linkHelper import LinkHelper
+from objects import glob
+from usecases.performance import merge_cache_stats, performance_cache_stats
+from usecases.executor import pp_pool
+from usecases.ppcache import pp_cache
+from usecases.beatmapcache import beatmap_files
+from usecases.packstore import pack_store
+from usecases.mapindex import map_index
+from usecases.osutools import osu_tools
+from usecases.comparison import comparison_stats
 
 import config
 
@@ -79,6 +90,7 @@ async def _execute():
         try:
             await self.bot.reload_extension(cog_path)
             self.reloaded_cogs.append(cog_path)
+            self.bot.message_filter.rebuild(self.bot)
             log(f"reloaded cog: {cog_path}", Ansi.GREEN)
             return True, None
         except Exception as e:
@@ -134,6 +146,7 @@ async def _execute():
             
         try:
             await self.bot.load_extension(cog)
+            self.bot.message_filter.rebuild(self.bot)
             await ctx.send(f"loaded: `{cog}`")
             log(f"loaded cog: {cog}", Ansi.GREEN)
             self.command_stats[cog] = 0  # init command usage tracking
@@ -152,6 +165,7 @@ async def _execute():
             
         try:
             await self.bot.unload_extension(cog)
+            self.bot.message_filter.rebuild(self.bot)
             await ctx.send(f"unloaded: `{cog}`")
             log(f"unloaded cog: {cog}", Ansi.GREEN)
         except Exception as e:
@@ -159,6 +173,138 @@ async def _execute():
             log(f"failed to unload {cog}: {e}", Ansi.RED)
             traceback.print_exc()
     
+    @commands.command(
+        name="stats"
+    )
+    async def stats(self, ctx: commands.Context) -> None:
+        """shows the bot's internal cache stats"""
+        if not await self.owner_check(ctx):
+            return
+
+        prefix_stats = PrefixHelper.stats()
+        filter_stats = self.bot.message_filter.stats()
+        link_stats = LinkHelper.stats()
+        writer_stats = glob.writer.stats()
+        db_stats = glob.db.stats()
+        # NOTE: with a process pool the caches that matter are the workers', not ours
+        pp_stats = merge_cache_stats(await pp_pool.per_worker(performance_cache_stats))
+        pool_stats = pp_pool.stats()
+        result_stats = pp_cache.stats()
+        file_stats = beatmap_files.stats()
+
+        stats = (
+            f"**prefix cache:** {prefix_stats['size']} guilds, "
+            f"{prefix_stats['hits']} hits, {prefix_stats['misses']} misses\n"
+            f"**message filter:** {filter_stats['commands']} commands, {filter_stats['passed']} passed, "
+            f"{filter_stats['dropped_prefix']} dropped (prefix), {filter_stats['dropped_command']} dropped (command)\n"
+        )
+
+        for name, cache in link_stats.items():
+            stats += (
+                f"**{name} links:** {cache['size']}/{cache['maxsize']} cached, "
+                f"{cache['hits']} hits, {cache['misses']} misses ({cache['hit_rate']:.0%})\n"
+            )
+
+        stats += (
+            f"**write-behind:** {writer_stats['depth']} queued, {writer_stats['rows_written']} rows in "
+            f"{writer_stats['flushes']} flushes ({writer_stats['coalesced']} coalesced, {writer_stats['failures']} failed, {writer_stats['dropped']} dropped), "
+            f"flush {writer_stats['avg_flush_ms']:.1f}ms avg / {writer_stats['max_flush_ms']:.1f}ms max\n"
+            f"**.data:** {file_stats['count']} maps, {file_stats['bytes'] / 1024 ** 2:.1f}/{file_stats['max_bytes'] / 1024 ** 2:.0f} MB, "
+            f"{file_stats['evicted']} evicted ({file_stats['evicted_bytes'] / 1024 ** 2:.1f} MB)\n"
+        )
+
+        index_stats = map_index.stats()
+        stats += (
+            f"**map index:** {index_stats['count']} maps, {index_stats['backfill_pending']} to backfill, "
+            f"{index_stats['failed']} unparseable, {index_stats['searches']} searches, "
+            f"{index_stats['lookup_hits']}/{index_stats['lookups']} lookups answered locally\n"
+        )
+
+        if pack_store is not None:
+            pack_stats = pack_store.stats()
+            stats += (
+                f"**pack store:** {pack_stats['count']} maps in {pack_stats['packs']} packs, "
+                f"{pack_stats['bytes'] / 1024 ** 2:.1f} MB ({pack_stats['raw_bytes'] / 1024 ** 2:.1f} MB uncompressed)\n"
+            )
+
+        if osu_tools.started:
+            tools_stats = osu_tools.stats()
+            stats += (
+                f"**osu-tools:** {tools_stats['idle']}/{tools_stats['workers']} workers idle, "
+                f"{tools_stats['completed']} done, {tools_stats['failed']} failed, {tools_stats['restarts']} restarts, "
+                f"run p50 {tools_stats['run_time_p50_ms']:.1f}ms / p95 {tools_stats['run_time_p95_ms']:.1f}ms\n"
+            )
+
+            compare_stats = comparison_stats()
+            stats += (
+                f"**pp comparisons:** {compare_stats['cache']['size']} cached, "
+                f"{compare_stats['cache']['hit_rate']:.0%} hit rate, {compare_stats['pending']} pending\n"
+            )
+
+        score_cog = self.bot.get_cog('Score')
+        if score_cog is not None:
+            prefetch_stats = score_cog.prefetcher.stats()
+            stats += (
+                f"**top prefetch:** {prefetch_stats['started']} sessions, {prefetch_stats['completed']} completed, "
+                f"{prefetch_stats['cancelled']} cancelled, {prefetch_stats['maps']} maps, "
+                f"{prefetch_stats['pages']} pages calculated, {prefetch_stats['failed']} failed\n"
+            )
+
+            page_stats = score_cog.page_stats()
+            stats += (
+                f"**score pages:** {page_stats['hits']} served from memo, {page_stats['renders']} rendered "
+                f"({page_stats['speculated']} speculatively)\n"
+            )
+
+            session_stats = score_cog.sessions.stats()
+            stats += (
+                f"**score sessions:** {session_stats['live']}/{session_stats['max_sessions']} live, "
+                f"{session_stats['expired']} expired, {session_stats['evicted']} evicted, "
+                f"{session_stats['unviewed']} un-buttoned ({session_stats['unview_queued']} queued, "
+                f"{session_stats['unview_skipped']} skipped)\n"
+            )
+
+        if pp_stats['workers']:
+            where = "in process" if pool_stats['kind'] == 'thread' else f"over {pp_stats['workers']}/{pool_stats['workers']} workers"
+            stats += (
+                f"**beatmap cache:** {where}, {pp_stats['beatmaps']['size']} maps ({pp_stats['beatmaps']['bytes'] / 1024 ** 2:.1f} MB), "
+                f"{pp_stats['beatmaps']['hit_rate']:.0%} hit rate, {pp_stats['beatmaps']['parse_time_saved']:.2f}s parsing saved "
+                f"({pp_stats['beatmaps']['parse_time']:.2f}s spent)\n"
+                f"**calculator cache:** {pp_stats['calculators']['size']} cached, {pp_stats['calculators']['hit_rate']:.0%} hit rate\n"
+                f"**difficulty cache:** {'on' if pp_stats['difficulty']['enabled'] else 'unsupported'}, "
+                f"{pp_stats['difficulty']['size']} cached, {pp_stats['difficulty']['hit_rate']:.0%} hit rate\n"
+            )
+        else:
+            stats += "**beatmap/calculator/difficulty caches:** no pp worker answered\n"
+
+        stats += (
+            f"**pp result cache:** {result_stats['memory_size']} in memory, {result_stats['memory_hits']} memory hits, "
+            f"{result_stats['disk_hits']} disk hits, {result_stats['misses']} misses ({result_stats['hit_rate']:.0%})\n"
+            f"**pp pool:** {pool_stats['workers']} {pool_stats['kind']} workers, {pool_stats['waiting']} waiting, "
+            f"{pool_stats['completed']} done, {pool_stats['timed_out']} timed out, {pool_stats['rejected']} rejected, {pool_stats['rebuilds']} rebuilds, "
+            f"queue wait p50 {pool_stats['queue_wait_p50_ms']:.1f}ms / p95 {pool_stats['queue_wait_p95_ms']:.1f}ms, "
+            f"run p50 {pool_stats['run_time_p50_ms']:.1f}ms / p95 {pool_stats['run_time_p95_ms']:.1f}ms\n"
+            f"**database:** {db_stats['retried']} retried, {db_stats['reconnects']} reconnects, {db_stats['timeouts']} timeouts\n"
+        )
+
+        for statement in db_stats['statements']:
+            stats += (
+                f"`{statement['query'][:60]}` {statement['count']}x, "
+                f"p50 {statement['p50_ms']:.1f}ms, p95 {statement['p95_ms']:.1f}ms, "
+                f"max {statement['max_ms']:.1f}ms, {statement['errors']} errors\n"
+            )
+
+        # NOTE: past discord's 2000 character limit the send fails, split on whole lines
+        message = ""
+        for line in stats.splitlines(keepends=True):
+            if len(message) + len(line) > 1990:
+                await ctx.send(message)
+                message = ""
+            message += line[:1990]
+
+        if message:
+            await ctx.send(message)
+
     @commands.command(
         name="guilds"
     )
@@ -2,6 +2,7 @@ from __future__ import annotations
 
 import os
 import re
+import shlex
 
 from dotenv import load_dotenv
 
@@ -15,6 +16,14 @@ def read_bool(env_var: str) -> bool:
     value = os.getenv(env_var)
     return value.strip().lower() in ("true", "1", "yes", "y", "on") if value else False
 
+def read_float(env_var: str, default: float) -> float:
+    value = os.getenv(env_var)
+    return float(value) if value and value.strip() else default
+
+def read_int(env_var: str, default: int) -> int:
+    value = os.getenv(env_var)
+    return int(value) if value and value.strip() else default
+
 TOKEN: str | None = os.getenv("TOKEN")
 DEBUG: bool = read_bool("DEBUG")
 OwnerID: int | None = int(os.getenv("OWNER_ID"))
@@ -29,6 +38,13 @@ db_config: dict[str, str | None] = {
     "db": os.getenv("DB_NAME"),
 }
 
+db_backend: str = (os.getenv("DB_BACKEND") or "mysql").strip().lower() # mysql | sqlite
+sqlite_path: str = os.getenv("SQLITE_PATH") or "kselon.db"
+
+db_timeout: float = read_float("DB_TIMEOUT", 5.0) # seconds, per query
+db_retries: int = read_int("DB_RETRIES", 2) # only for reads
+db_slow_query_ms: float = read_float("DB_SLOW_QUERY_MS", 250.0)
+
 Bancho: str | None = os.getenv("BANCHO")
 BanchoApiKey: str | None = os.getenv("BANCHO_API_KEY")
 
@@ -36,6 +52,30 @@ ownercheckmotd: list[str] = read_list("OWNER_MOTD")
 
 lastfm: str | None = os.getenv("LASTFM")
 
+# pp calculation
+beatmap_cache_entries: int = read_int("BEATMAP_CACHE_ENTRIES", 128) # parsed maps kept in memory
+beatmap_cache_mb: int = read_int("BEATMAP_CACHE_MB", 64) # by .osu file size
+beatmap_disk_mb: int = read_int("BEATMAP_DISK_MB", 2048) # .data budget before lru eviction
+beatmap_store: str = (os.getenv("BEATMAP_STORE") or "files").strip().lower() # files | pack
+beatmap_pack_dir: str = os.getenv("BEATMAP_PACK_DIR") or ".data/packs"
+pp_executor: str = (os.getenv("PP_EXECUTOR") or "process").strip().lower() # process | thread
+pp_workers: int = read_int("PP_WORKERS", 2)
+pp_max_queue: int = read_int("PP_MAX_QUEUE", 32) # jobs waiting for a worker before we refuse more
+pp_timeout: float = read_float("PP_TIMEOUT", 10.0) # seconds per job
+pp_cache_path: str = os.getenv("PP_CACHE_PATH") or "ppcache.db" # memoized pp results
+map_index_path: str = os.getenv("MAP_INDEX_PATH") or "mapindex.db" # offline beatmap search
+osu_tools_path: str = os.getenv("OSU_TOOLS_PATH") or "osutools"
+osu_tools_worker: list[str] = shlex.split(os.getenv("OSU_TOOLS_WORKER") or "dotnet tools/osutools-worker/bin/Release/net8.0/OsuToolsWorker.dll")
+osu_tools_workers: int = read_int("OSU_TOOLS_WORKERS", 2)
+osu_tools_timeout: float = read_float("OSU_TOOLS_TIMEOUT", 30.0) # seconds per score
+osu_tools_concurrency: int = read_int("OSU_TOOLS_CONCURRENCY", 4) # dotnet processes at once without the worker pool
+pp_compare_timeout: float = read_float("PP_COMPARE_TIMEOUT", 5.0) # how long a comparison waits for osu-tools
+
+# score pagination
+score_session_ttl: float = read_float("SCORE_SESSION_TTL", 60.0) # seconds since the last button press
+score_sessions_max: int = read_int("SCORE_SESSIONS_MAX", 500) # live sessions before the least recently used goes
+score_unview_rate: float = read_float("SCORE_UNVIEW_RATE", 5.0) # expired messages un-buttoned per second
+
 use_start_prompt: bool = read_bool("USE_START_PROMPT")
 starting_prompt_id: int | None = int(os.getenv("STARTING_PROMPT_ID"))
 MODEL: str | None = os.getenv("MODEL")
@@ -0,0 +1,22 @@
+-- SQLite schema for the embedded storage backend (DB_BACKEND=sqlite)
+-- mirrors kselon.sql, applied on every startup so it has to stay idempotent
+
+CREATE TABLE IF NOT EXISTS `guilds` (
+  `guild_id` integer NOT NULL PRIMARY KEY,
+  `prefix` varchar(3) NOT NULL CHECK (length(`prefix`) <= 3),
+  `created_at` timestamp NULL DEFAULT CURRENT_TIMESTAMP,
+  `updated_at` timestamp NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS `lastfm` (
+  `id` integer NOT NULL PRIMARY KEY,
+  `username` varchar(255) NOT NULL,
+  `created_at` timestamp NULL DEFAULT CURRENT_TIMESTAMP,
+  `updated_at` timestamp NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS `users` (
+  `id` integer NOT NULL PRIMARY KEY,
+  `name` text,
+  `mode` int NOT NULL DEFAULT '0'
+);
@@ -11,13 +11,23 @@ from datetime import datetime
 
 from utils.logging import log
 from utils.logging import Ansi
-from cmyui.mysql import AsyncSQLPool
 
 from objects import glob
 
 from commands import CATEGORIES
 from utils.help import Help
 from commands.guilds.prefix import get_prefix
+from utils.prefixHelper import PrefixHelper, DEFAULT_PREFIX
+from utils.messageFilter import MessageFilter
+from utils.writeBehind import WriteBehind
+from utils.database import Database
+from utils.sqlite import SQLiteDatabase
+from usecases.executor import pp_pool
+from usecases.ppcache import pp_cache
+from usecases.beatmapcache import beatmap_files
+from usecases.packstore import pack_store
+from usecases.osutools import osu_tools
+from usecases.mapindex import map_index
 
 class Bot(commands.Bot):
     def __init__(self) -> None:
@@ -34,14 +44,34 @@ class Bot(commands.Bot):
                          help_command=Help())
         
         self.startup_time = datetime.now()
+        self.message_filter = MessageFilter()
     
     async def setup_hook(self) -> None: 
         log("starting bot setup...", Ansi.CYAN)
         
         await self.load_extensions()
+        self.message_filter.rebuild(self)
         await self.initialize_db()
+        await self.load_caches()
         self.check_db_connection.start()
 
+        glob.writer = WriteBehind() # NOTE: batches guilds/users/lastfm upserts
+        glob.writer.start()
+
+    async def close(self) -> None:
+        # NOTE: flush queued writes before the connection goes away
+        if hasattr(glob, 'writer'):
+            await glob.writer.close()
+
+        pp_pool.shutdown()
+        beatmap_files.stop()
+        if pack_store is not None:
+            pack_store.close()
+        await pp_cache.close()
+        await map_index.close()
+        await osu_tools.close()
+        await super().close()
+
     async def on_ready(self):
         ai_chat_cog = self.get_cog('AiChat')
         if ai_chat_cog:
@@ -110,7 +140,15 @@ class Bot(commands.Bot):
         """lower the message""" # TODO: regex for beatmaps
         if message.author == self.user:
             return
-        
+
+        # NOTE: drop plain chatter before lowering/parsing anything,
+        #       only when we actually know every guild's prefix.
+        #       peek, get_prefix does the counted lookup for whatever gets through
+        if message.guild is None or PrefixHelper.loaded:
+            prefix = PrefixHelper.peek(message.guild.id) if message.guild else DEFAULT_PREFIX
+            if not self.message_filter.is_command(message.content, prefix):
+                return
+
         if message.content.startswith('!eval') or message.content.startswith('!py'):
             await self.process_commands(message)
             return
@@ -120,22 +158,63 @@ class Bot(commands.Bot):
 
     async def initialize_db(self) -> None:
         try:
-            glob.db = AsyncSQLPool()
-            await glob.db.connect(glob.config.db_config)
+            if glob.config.db_backend == 'sqlite':
+                glob.db = SQLiteDatabase(
+                    glob.config.sqlite_path,
+                    schema='kselon.sqlite.sql',
+                    slow_query_ms=glob.config.db_slow_query_ms
+                )
+                await glob.db.connect()
+                log(f'opened SQLite database at {glob.config.sqlite_path}!', Ansi.LGREEN)
+                return
+
+            glob.db = Database(
+                glob.config.db_config,
+                timeout=glob.config.db_timeout,
+                retries=glob.config.db_retries,
+                slow_query_ms=glob.config.db_slow_query_ms
+            )
+            await glob.db.connect()
             log('connected to MySQL!', Ansi.LGREEN)
         except Exception as e:
             log(f"database connection failed: {str(e)}", Ansi.RED)
 
+    async def load_caches(self) -> None:
+        try:
+            await PrefixHelper.load()
+        except Exception as e:
+            log(f"failed to load prefix cache: {str(e)}", Ansi.RED)
+
+        try:
+            await beatmap_files.load()
+            beatmap_files.start()
+        except Exception as e:
+            log(f"failed to index cached beatmaps: {str(e)}", Ansi.RED)
+
+        try:
+            await pp_cache.connect()
+        except Exception as e:
+            log(f"failed to open pp cache, only caching in memory: {str(e)}", Ansi.RED)
+
+        # NOTE: after beatmap_files, the backfill works off its index
+        try:
+            await map_index.connect()
+        except Exception as e:
+            log(f"failed to open the beatmap index, !search is unavailable: {str(e)}", Ansi.RED)
+
     @tasks.loop(minutes=3)
     async def check_db_connection(self) -> None:
         """db connection check"""
-        # XXX: per sometime the db just throws ConnectionResetError??
-        # XXX: idk anymore i just want to sleep
+        # NOTE: queries retry + reconnect on their own now,
+        #       this just keeps an idle pool from going stale
         if glob.db:
             try:
                 await glob.db.fetch('select 1') # just try to fetch somethign
-            except:
-                await self.initialize_db()
+            except Exception:
+                try:
+                    await glob.db.reconnect()
+                except Exception as e:
+                    log(f"database reconnect failed: {str(e)}", Ansi.RED)
 
     @check_db_connection.before_loop
     async def before_check_db_connection(self) -> None:
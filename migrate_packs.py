@@ -0,0 +1,53 @@
+"""
+one-shot migration of the loose .data/<md5>.osu files into the pack store,
+set BEATMAP_STORE=pack afterwards. files are only deleted with --delete.
+
+usage: python migrate_packs.py [--delete] [pack dir]
+"""
+from __future__ import annotations
+
+import hashlib
+import os
+import sys
+
+from pathlib import Path
+
+import config
+
+from utils.logging import log, Ansi
+from usecases.packstore import PackStore
+
+def migrate(directory: Path, pack_dir: Path, delete: bool) -> None:
+    store = PackStore(pack_dir)
+    migrated = skipped = raw_bytes = 0
+
+    with os.scandir(directory) as entries:
+        paths = [Path(entry.path) for entry in entries if entry.name.endswith('.osu') and entry.is_file()]
+
+    for path in paths:
+        content = path.read_bytes()
+
+        # NOTE: the pack is content addressed, a file whose name isn't its md5 was never valid
+        if hashlib.md5(content).hexdigest() != path.stem:
+            log(f"skipping {path.name}, md5 doesn't match its name", Ansi.YELLOW)
+            skipped += 1
+            continue
+
+        store.add(content)
+        migrated += 1
+        raw_bytes += len(content)
+
+        if delete:
+            path.unlink()
+
+    stats = store.stats()
+    store.close()
+
+    log(
+        f"migrated {migrated} maps ({skipped} skipped), {raw_bytes / 1024 ** 2:.1f} MB -> "
+        f"{stats['bytes'] / 1024 ** 2:.1f} MB in {stats['packs']} packs", Ansi.LGREEN
+    )
+
+if __name__ == '__main__':
+    args = [arg for arg in sys.argv[1:] if arg != '--delete']
+    migrate(Path(".data"), Path(args[0] if args else config.beatmap_pack_dir), '--delete' in sys.argv)
@@ -0,0 +1,50 @@
+"""
+one-shot migration from the mysql database (kselon.sql) to the embedded
+sqlite backend, reads DB_* / SQLITE_PATH from the same .env as the bot.
+
+usage: python migrate_sqlite.py [sqlite path]
+"""
+from __future__ import annotations
+
+import asyncio
+import sys
+
+import config
+
+from utils.logging import log, Ansi
+from utils.database import Database
+from utils.sqlite import SQLiteDatabase
+
+# table -> (primary key, columns to copy)
+TABLES = {
+    'guilds': (('guild_id',), ('guild_id', 'prefix', 'created_at', 'updated_at')),
+    'users': (('id',), ('id', 'name', 'mode')),
+    'lastfm': (('id',), ('id', 'username', 'created_at', 'updated_at')),
+}
+
+async def migrate(sqlite_path: str) -> None:
+    mysql = Database(config.db_config, timeout=60.0)
+    sqlite = SQLiteDatabase(sqlite_path, schema='kselon.sqlite.sql')
+
+    await mysql.connect()
+    await sqlite.connect()
+
+    try:
+        for table, (key, columns) in TABLES.items():
+            rows = await mysql.fetchall(f"select {', '.join(columns)} from {table}", _dict=False)
+
+            if rows:
+                # NOTE: re-running the migration just overwrites, never duplicates
+                await sqlite.executemany(sqlite.build_upsert(table, key, columns, 1), [
+                    [str(value) if column.endswith('_at') and value is not None else value
+                     for column, value in zip(columns, row)]
+                    for row in rows
+                ])
+
+            log(f"migrated {len(rows)} rows from {table}", Ansi.LGREEN)
+    finally:
+        await mysql.close()
+        await sqlite.close()
+
+if __name__ == '__main__':
+    asyncio.run(migrate(sys.argv[1] if len(sys.argv) > 1 else config.sqlite_path))
@@ -1,6 +1,6 @@
 # -*- coding: utf-8 -*-
 
-__all__ = ('db', 'http', 'version', 'cache')
+__all__ = ('db', 'writer', 'http', 'version', 'cache')
 
 from typing import TYPE_CHECKING
 
@@ -8,10 +8,13 @@ import config  # imported for indirect use
 
 if TYPE_CHECKING:
     from aiohttp import ClientSession
-    from cmyui.mysql import AsyncSQLPool
+    from utils.database import Database
+    from utils.sqlite import SQLiteDatabase
     from cmyui.version import Version
+    from utils.writeBehind import WriteBehind
 
-db: 'AsyncSQLPool'
+db: 'Database | SQLiteDatabase'
+writer: 'WriteBehind'
 http: 'ClientSession'
 version: 'Version'
 
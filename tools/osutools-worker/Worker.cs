@@ -0,0 +1,67 @@
+using System.Text.Json;
+using System.Text.Json.Nodes;
+
+namespace OsuToolsWorker
+{
+    // NOTE: keeps PerformanceCalculator (and the rulesets it loads) resident,
+    //       one json request per stdin line, one json response per stdout line.
+    //       see usecases/osutools.py for the protocol.
+    public static class Worker
+    {
+        public static void Main()
+        {
+            var stdout = Console.Out;
+            string? line;
+
+            while ((line = Console.In.ReadLine()) != null)
+            {
+                if (string.IsNullOrWhiteSpace(line))
+                    continue;
+
+                var response = new JsonObject();
+
+                try
+                {
+                    var request = JsonNode.Parse(line)!.AsObject();
+                    response["id"] = request["id"]?.GetValue<long>();
+
+                    if (request.ContainsKey("ping"))
+                    {
+                        response["ok"] = true;
+                        response["output"] = "pong";
+                    }
+                    else
+                    {
+                        var args = request["args"]!.AsArray().Select(arg => arg!.GetValue<string>()).ToArray();
+                        response["ok"] = true;
+                        response["output"] = run(args);
+                    }
+                }
+                catch (Exception e)
+                {
+                    response["ok"] = false;
+                    response["error"] = e.Message;
+                }
+                finally
+                {
+                    Console.SetOut(stdout);
+                }
+
+                stdout.WriteLine(response.ToJsonString());
+                stdout.Flush();
+            }
+        }
+
+        private static string run(string[] args)
+        {
+            // XXX: the cli writes its results to the console, capture them instead of
+            //      letting them corrupt the protocol stream
+            var output = new StringWriter();
+            Console.SetOut(output);
+
+            PerformanceCalculator.Program.Main(args);
+
+            return output.ToString();
+        }
+    }
+}
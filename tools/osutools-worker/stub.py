@@ -0,0 +1,34 @@
+"""
+stand-in for the dotnet worker, same protocol, no osu-tools needed.
+answers simulate jobs with made up but stable numbers.
+
+usage: OSU_TOOLS_WORKER="python tools/osutools-worker/stub.py"
+"""
+import hashlib
+import json
+import sys
+
+def simulate(args: list) -> str:
+    digest = int(hashlib.md5(' '.join(args).encode()).hexdigest()[:8], 16)
+
+    return (
+        f"pp                 : {digest % 100000 / 100:.2f}\n"
+        f"star rating        : {digest % 1000 / 100:.2f}\n"
+        f"max combo          : {digest % 3000}\n"
+    )
+
+for line in sys.stdin:
+    if not line.strip():
+        continue
+
+    request = json.loads(line)
+
+    if 'ping' in request:
+        response = {'id': request['id'], 'ok': True, 'output': 'pong'}
+    elif request['args'][:1] == ['simulate']:
+        response = {'id': request['id'], 'ok': True, 'output': simulate(request['args'])}
+    else:
+        response = {'id': request['id'], 'ok': False, 'error': f"unsupported command {request['args'][:1]}"}
+
+    sys.stdout.write(json.dumps(response) + '\n')
+    sys.stdout.flush()
@@ -0,0 +1,172 @@
+from __future__ import annotations
+
+import asyncio
+import os
+import time
+import config
+
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from utils.logging import log, Ansi
+
+# NOTE: never evict a map touched this recently, it might be about to be parsed
+EVICTION_GRACE = 60.0
+
+class CachedBeatmap:
+    __slots__ = ('size', 'last_access')
+
+    def __init__(self, size: int, last_access: float) -> None:
+        self.size = size
+        self.last_access = last_access
+
+class BeatmapFileCache:
+    def __init__(self, directory: Path, max_bytes: int, interval: float = 60.0) -> None:
+        """
+        index of the .osu files in `directory` (md5 -> size, last access) in lru order.
+
+        answers "how many maps / how many bytes" without touching the disk and
+        evicts the least recently used files once the directory grows past `max_bytes`.
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.interval = interval
+
+        self.index: OrderedDict[str, CachedBeatmap] = OrderedDict()
+        self.bytes: int = 0
+        self.loaded: bool = False
+
+        self.evicted: int = 0
+        self.evicted_bytes: int = 0
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup = asyncio.Event()
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def __contains__(self, md5: str) -> bool:
+        return md5 in self.index
+
+    def _scan(self) -> List[Tuple[str, int, float]]:
+        self.directory.mkdir(exist_ok=True)
+        found = []
+
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                if entry.name.endswith('.osu') and entry.is_file():
+                    stat = entry.stat()
+                    # NOTE: mtime, atime is useless on noatime mounts
+                    found.append((entry.name[:-4], stat.st_size, stat.st_mtime))
+
+        return sorted(found, key=lambda item: item[2])
+
+    async def load(self) -> None:
+        """build the index with one scan of the directory"""
+        found = await asyncio.to_thread(self._scan)
+
+        # XXX: keep whatever got added while we were scanning, it's newer
+        index: OrderedDict[str, CachedBeatmap] = OrderedDict(
+            (md5, CachedBeatmap(size, last_access)) for md5, size, last_access in found
+        )
+        for md5, entry in self.index.items():
+            index.pop(md5, None)
+            index[md5] = entry
+
+        self.index = index
+        self.bytes = sum(entry.size for entry in index.values())
+        self.loaded = True
+
+        log(f"indexed {len(self.index)} cached beatmaps ({self.bytes / 1024 ** 2:.1f} MB)", Ansi.LGREEN)
+        self._wakeup.set()
+
+    def touch(self, md5: str) -> bool:
+        """mark a map as used, False if it isn't cached"""
+        entry = self.index.get(md5)
+        if entry is None:
+            return False
+
+        entry.last_access = time.time()
+        self.index.move_to_end(md5)
+        return True
+
+    def add(self, md5: str, size: int) -> None:
+        old = self.index.pop(md5, None)
+        if old is not None:
+            self.bytes -= old.size
+
+        self.index[md5] = CachedBeatmap(size, time.time())
+        self.bytes += size
+
+        if self.bytes > self.max_bytes:
+            self._wakeup.set()
+
+    def discard(self, md5: str) -> None:
+        entry = self.index.pop(md5, None)
+        if entry is not None:
+            self.bytes -= entry.size
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+
+            self._wakeup.clear()
+
+            try:
+                await self.evict()
+            except Exception as e:
+                log(f"error evicting cached beatmaps: {e}", Ansi.YELLOW)
+
+    async def evict(self) -> None:
+        """drop least recently used maps until we're back under budget"""
+        if not self.loaded or self.bytes <= self.max_bytes:
+            return
+
+        cutoff = time.time() - EVICTION_GRACE
+        victims: List[str] = []
+
+        for md5, entry in self.index.items():
+            if self.bytes <= self.max_bytes or entry.last_access > cutoff:
+                break
+
+            victims.append(md5)
+            self.bytes -= entry.size
+            self.evicted_bytes += entry.size
+
+        for md5 in victims:
+            del self.index[md5]
+
+        self.evicted += len(victims)
+
+        if victims:
+            await asyncio.to_thread(self._unlink, victims)
+
+    def _unlink(self, victims: List[str]) -> None:
+        for md5 in victims:
+            try:
+                os.unlink(self.directory / f"{md5}.osu")
+            except FileNotFoundError:
+                pass
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'count': len(self.index),
+            'bytes': self.bytes,
+            'max_bytes': self.max_bytes,
+            'evicted': self.evicted,
+            'evicted_bytes': self.evicted_bytes,
+        }
+
+beatmap_files = BeatmapFileCache(Path(".data"), config.beatmap_disk_mb * 1024 * 1024)
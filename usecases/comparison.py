@@ -0,0 +1,95 @@
+from __future__ import annotations
+
+import asyncio
+import config
+
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence
+
+from utils.cache import TTLCache, MISSING
+from utils.logging import log, Ansi
+from usecases.performance import PerformanceJob, calculate_osu_tools_async, calculate_performances_parallel
+from usecases.ppcache import score_key
+from usecases.osutools import WorkerUnavailable, osu_tools
+
+class Comparison(NamedTuple):
+    pp: float
+    stars: float
+    # NOTE: None while osu-tools is still working on it (or gave up)
+    pp_bancho: Optional[float]
+    stars_bancho: Optional[float]
+
+    @property
+    def delta(self) -> Optional[float]:
+        return None if self.pp_bancho is None else self.pp - self.pp_bancho
+
+# osu-tools results, refx results already live in pp_cache
+bancho_cache: TTLCache[str, Dict[str, Any]] = TTLCache(maxsize=4096)
+_pending: Dict[str, asyncio.Task] = {}
+
+async def _simulate(job: PerformanceJob) -> Dict[str, Any]:
+    try:
+        return await osu_tools.simulate(job.osu_file_path, job.score)
+    except WorkerUnavailable as e:
+        # NOTE: no resident workers here, a dotnet process per score is slow but still an answer
+        log(f"{e}, running PerformanceCalculator directly", Ansi.YELLOW)
+        return (await calculate_osu_tools_async(job.osu_file_path, [job.score], fallback=False))[0]
+
+def _bancho_task(job: PerformanceJob) -> asyncio.Task:
+    """single-flight osu-tools run that fills bancho_cache whenever it finishes"""
+    key = score_key(job.beatmap_md5, job.score)
+
+    task = _pending.get(key)
+    if task is None:
+        task = asyncio.create_task(_simulate(job))
+        _pending[key] = task
+
+        def done(task: asyncio.Task) -> None:
+            _pending.pop(key, None)
+            if task.cancelled():
+                return
+
+            if task.exception() is not None:
+                log(f"osu-tools failed for {job.beatmap_md5}: {task.exception()!r}", Ansi.YELLOW)
+            else:
+                bancho_cache.set(key, task.result())
+
+        task.add_done_callback(done)
+
+    return task
+
+async def calculate_bancho(job: PerformanceJob, timeout: Optional[float] = None) -> Optional[Dict[str, Any]]:
+    """osu-tools result for a job, None if it failed or didn't make the deadline"""
+    result = bancho_cache.get(score_key(job.beatmap_md5, job.score))
+    if result is not MISSING:
+        return result
+
+    try:
+        # NOTE: shielded, a late result still lands in the cache for next time
+        return await asyncio.wait_for(asyncio.shield(_bancho_task(job)), timeout=timeout or config.pp_compare_timeout)
+    except Exception:
+        return None
+
+def combine(refx: Dict[str, Any], bancho: Optional[Dict[str, Any]]) -> Comparison:
+    return Comparison(
+        pp=round(refx['performance']['pp'], 2),
+        stars=round(float(refx['difficulty']['stars']), 2),
+        pp_bancho=round(bancho['performance']['pp'], 2) if bancho else None,
+        stars_bancho=round(float(bancho['difficulty']['stars']), 2) if bancho else None
+    )
+
+async def compare_performances(jobs: Sequence[PerformanceJob], timeout: Optional[float] = None) -> List[Comparison]:
+    """
+    refx (pp_pool processes) and osu-tools (its own resident workers) for the same
+    jobs at the same time. refx is never held back by osu-tools, anything osu-tools
+    doesn't finish within `timeout` comes back with pp_bancho None.
+    """
+    bancho = asyncio.gather(*[calculate_bancho(job, timeout) for job in jobs])
+    refx = await calculate_performances_parallel(list(jobs))
+
+    return [combine(r, b) for r, b in zip(refx, await bancho)]
+
+def comparison_stats() -> Dict[str, Any]:
+    return {
+        'cache': bancho_cache.stats(),
+        'pending': len(_pending),
+    }
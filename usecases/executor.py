@@ -0,0 +1,196 @@
+from __future__ import annotations
+
+import asyncio
+import multiprocessing
+import os
+import time
+import config
+
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, List, Optional, TypeVar
+
+from utils.database import LatencyHistogram
+from utils.logging import log, Ansi
+
+T = TypeVar('T')
+
+class PoolBusy(Exception):
+    """the submission queue is full"""
+
+def _call_with_pid(fn: Callable[[], T]) -> tuple[int, T]:
+    return os.getpid(), fn()
+
+class CalculationPool:
+    def __init__(self, kind: str = 'process', workers: int = 2,
+                 max_queue: int = 32, timeout: float = 10.0) -> None:
+        """
+        runs cpu heavy work (pp/difficulty calculation) off the event loop.
+
+        at most `workers` jobs run at once, up to `max_queue` more may wait
+        for a slot before submissions get rejected with PoolBusy, and a job
+        that takes longer than `timeout` seconds is abandoned. in a process
+        pool its worker gets killed and the pool rebuilt, the same happens
+        when a worker dies on its own.
+        """
+        self.kind = kind
+        self.workers = workers
+        self.max_queue = max_queue
+        self.timeout = timeout
+
+        self._executor: Optional[Executor] = None
+        self._slots = asyncio.Semaphore(workers)
+        self.waiting: int = 0
+
+        self.completed: int = 0
+        self.rejected: int = 0
+        self.timed_out: int = 0
+        self.failed: int = 0
+        self.rebuilds: int = 0
+        self.queue_wait = LatencyHistogram()
+        self.run_time = LatencyHistogram()
+
+    @property
+    def executor(self) -> Executor:
+        # XXX: created lazily so importing this in a worker process never spawns another pool
+        if self._executor is None:
+            if self.kind == 'thread':
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='pp')
+            else:
+                # NOTE: not fork, by now the bot has threads and a child could inherit one of their
+                #       locks held (pack store, beatmap cache, sqlite), then hang on it forever
+                method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context(method)
+                )
+
+        return self._executor
+
+    async def submit(self, fn: Callable[..., T], *args: Any, timeout: Optional[float] = None) -> T:
+        if self.waiting >= self.max_queue:
+            self.rejected += 1
+            raise PoolBusy(f"calculation queue is full ({self.max_queue} waiting)")
+
+        queued_at = time.perf_counter()
+        self.waiting += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self.waiting -= 1
+
+        started_at = time.perf_counter()
+        self.queue_wait.observe((started_at - queued_at) * 1000)
+
+        loop = asyncio.get_running_loop()
+        future: Optional[asyncio.Future] = None
+
+        try:
+            for attempt in range(2):
+                executor = self.executor
+                try:
+                    future = loop.run_in_executor(executor, fn, *args)
+
+                    # NOTE: shielded, timing out stops our wait but not the worker
+                    result = await asyncio.wait_for(asyncio.shield(future), timeout=timeout or self.timeout)
+                    break
+                except BrokenProcessPool:
+                    # NOTE: a worker died (or was killed for someone else's timeout), one more go on a fresh pool
+                    self._retire(executor)
+                    if attempt:
+                        raise
+        except asyncio.TimeoutError:
+            self.timed_out += 1
+            future.add_done_callback(self._release)
+
+            # XXX: the worker is still busy with the job, its slot is only free once it's done.
+            #      threads can't be stopped, a process can, so a hung one can't starve the pool
+            if isinstance(executor, ProcessPoolExecutor):
+                self._retire(executor)
+            raise
+        except asyncio.CancelledError:
+            if future is None or future.done():
+                self._slots.release()
+            else:
+                future.add_done_callback(self._release)
+            raise
+        except Exception:
+            self.failed += 1
+            self._slots.release()
+            raise
+
+        self._slots.release()
+
+        self.run_time.observe((time.perf_counter() - started_at) * 1000)
+        self.completed += 1
+
+        return result
+
+    async def per_worker(self, fn: Callable[[], T]) -> List[T]:
+        """
+        fn's result from each worker process, for state that lives in the workers
+        (their caches). the executor picks the worker, so a few extra calls are
+        sent and deduplicated by pid, a worker that got none is simply missing.
+        """
+        if self.kind == 'thread':
+            return [fn()]
+
+        results = await asyncio.gather(*[
+            self.submit(_call_with_pid, fn) for _ in range(self.workers * 2)
+        ], return_exceptions=True)
+
+        by_pid = dict(result for result in results if not isinstance(result, BaseException))
+        return list(by_pid.values())
+
+    def _release(self, future: asyncio.Future) -> None:
+        """free the slot of a job nobody is waiting for anymore"""
+        self._slots.release()
+
+        # NOTE: retrieved so an abandoned job that failed isn't logged as never retrieved
+        if not future.cancelled():
+            future.exception()
+
+    def _retire(self, executor: Executor) -> None:
+        """replace a process pool that's broken or stuck, its workers are killed"""
+        if self._executor is executor:
+            self._executor = None
+            self.rebuilds += 1
+            log("rebuilding the pp process pool", Ansi.YELLOW)
+
+        # XXX: no public api for the worker processes. whatever still runs there
+        #      fails with BrokenProcessPool, which gives its slot back
+        processes = list((getattr(executor, '_processes', None) or {}).values())
+        executor.shutdown(wait=False)
+
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'kind': self.kind,
+            'workers': self.workers,
+            'waiting': self.waiting,
+            'completed': self.completed,
+            'rejected': self.rejected,
+            'timed_out': self.timed_out,
+            'failed': self.failed,
+            'rebuilds': self.rebuilds,
+            'queue_wait_p50_ms': self.queue_wait.percentile(0.5),
+            'queue_wait_p95_ms': self.queue_wait.percentile(0.95),
+            'queue_wait_max_ms': self.queue_wait.max_ms,
+            'run_time_p50_ms': self.run_time.percentile(0.5),
+            'run_time_p95_ms': self.run_time.percentile(0.95),
+        }
+
+pp_pool = CalculationPool(
+    kind=config.pp_executor,
+    workers=config.pp_workers,
+    max_queue=config.pp_max_queue,
+    timeout=config.pp_timeout
+)
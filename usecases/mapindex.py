@@ -0,0 +1,358 @@
+from __future__ import annotations
+
+import asyncio
+import io
+import re
+import time
+import config
+
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+from utils.logging import log, Ansi
+from utils.sqlite import SQLiteDatabase
+from usecases.beatmapcache import beatmap_files
+from usecases.packstore import pack_store
+
+SCHEMA = (
+    'create table if not exists beatmaps ('
+    'md5 text primary key, beatmap_id integer not null, set_id integer not null, mode integer not null, '
+    'artist text not null, title text not null, version text not null, creator text not null, tags text not null, '
+    'bpm real not null, total_length integer not null, '
+    'circles integer not null, sliders integer not null, spinners integer not null, '
+    'ar real not null, od real not null, cs real not null, hp real not null, indexed_at integer not null)',
+    'create index if not exists beatmaps_beatmap_id on beatmaps (beatmap_id)',
+    # NOTE: external content, the triggers keep it in step with every upsert in the same transaction
+    "create virtual table if not exists beatmaps_search using fts5("
+    "artist, title, version, creator, tags, content='beatmaps', content_rowid='rowid', "
+    "prefix='2 3', tokenize='unicode61 remove_diacritics 2')",
+    'create trigger if not exists beatmaps_search_insert after insert on beatmaps begin '
+    'insert into beatmaps_search (rowid, artist, title, version, creator, tags) '
+    'values (new.rowid, new.artist, new.title, new.version, new.creator, new.tags); end',
+    'create trigger if not exists beatmaps_search_delete after delete on beatmaps begin '
+    "insert into beatmaps_search (beatmaps_search, rowid, artist, title, version, creator, tags) "
+    "values ('delete', old.rowid, old.artist, old.title, old.version, old.creator, old.tags); end",
+    'create trigger if not exists beatmaps_search_update after update on beatmaps begin '
+    "insert into beatmaps_search (beatmaps_search, rowid, artist, title, version, creator, tags) "
+    "values ('delete', old.rowid, old.artist, old.title, old.version, old.creator, old.tags); "
+    'insert into beatmaps_search (rowid, artist, title, version, creator, tags) '
+    'values (new.rowid, new.artist, new.title, new.version, new.creator, new.tags); end',
+)
+
+# NOTE: shaped like the api's map object so callers can use either
+COLUMNS = ', '.join(f"beatmaps.{column}" for column in (
+    'md5', 'beatmap_id as id', 'set_id', 'mode', 'artist', 'title', 'version', 'creator',
+    'bpm', 'total_length', 'circles', 'sliders', 'spinners', 'ar', 'od', 'cs', 'hp'
+))
+
+SEARCH_TERM = re.compile(r"\w+")
+
+class IndexedBeatmap(NamedTuple):
+    md5: str
+    beatmap_id: int
+    set_id: int
+    mode: int
+    artist: str
+    title: str
+    version: str
+    creator: str
+    tags: str
+    bpm: float
+    total_length: int # NOTE: seconds, up to the start of the last object
+    circles: int
+    sliders: int # NOTE: holds on mania
+    spinners: int
+    ar: float
+    od: float
+    cs: float
+    hp: float
+
+def _number(value: Optional[str], default: float = 0.0) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return default
+
+def parse_beatmap(md5: str, lines: Iterable[str]) -> IndexedBeatmap:
+    """
+    one pass over an .osu file, line by line. [General]/[Metadata]/[Difficulty]
+    are read as key/value pairs, timing points only for their beat length and
+    hit objects only for their time and type, nothing else is kept around.
+    """
+    section = None
+    values: Dict[str, str] = {}
+    timing: List[Tuple[float, float]] = []
+    last = None
+    circles = sliders = spinners = 0
+
+    lines = iter(lines)
+    if not next(lines, '').lstrip().startswith('osu file format'):
+        raise ValueError("not an .osu file")
+
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith('//'):
+            continue
+
+        if line.startswith('['):
+            section = line
+            continue
+
+        if section == '[HitObjects]':
+            fields = line.split(',', 4)
+            if len(fields) < 4:
+                continue
+
+            last = _number(fields[2])
+
+            kind = int(_number(fields[3]))
+            if kind & 1:
+                circles += 1
+            elif kind & (2 | 128):
+                sliders += 1
+            elif kind & 8:
+                spinners += 1
+        elif section == '[TimingPoints]':
+            fields = line.split(',')
+            beat_length = _number(fields[1] if len(fields) > 1 else None)
+            # NOTE: uninherited only, v5 and older files don't have the flag at all
+            if beat_length > 0 and (len(fields) < 7 or fields[6].strip() != '0'):
+                timing.append((_number(fields[0]), beat_length))
+        elif section in ('[General]', '[Metadata]', '[Difficulty]'):
+            key, sep, value = line.partition(':')
+            if sep:
+                values[key.strip()] = value.strip()
+
+    return IndexedBeatmap(
+        md5=md5,
+        beatmap_id=int(_number(values.get('BeatmapID'))),
+        set_id=int(_number(values.get('BeatmapSetID'))),
+        mode=int(_number(values.get('Mode'))),
+        artist=values.get('Artist', ''),
+        title=values.get('Title', ''),
+        version=values.get('Version', ''),
+        creator=values.get('Creator', ''),
+        tags=values.get('Tags', ''),
+        bpm=main_bpm(timing, last or 0.0),
+        total_length=round((last or 0.0) / 1000),
+        circles=circles,
+        sliders=sliders,
+        spinners=spinners,
+        # XXX: old maps have no ApproachRate, it used to be the OD
+        ar=_number(values.get('ApproachRate'), _number(values.get('OverallDifficulty'), 5.0)),
+        od=_number(values.get('OverallDifficulty'), 5.0),
+        cs=_number(values.get('CircleSize'), 5.0),
+        hp=_number(values.get('HPDrainRate'), 5.0),
+    )
+
+def main_bpm(timing: List[Tuple[float, float]], end: float) -> float:
+    """the bpm that lasts the longest, same as what the website shows"""
+    if not timing:
+        return 0.0
+
+    durations: Dict[float, float] = {}
+    for i, (start, beat_length) in enumerate(timing):
+        until = timing[i + 1][0] if i + 1 < len(timing) else max(end, start)
+        durations[beat_length] = durations.get(beat_length, 0.0) + max(until - start, 0.0)
+
+    beat_length = max(durations, key=lambda length: (durations[length], -length))
+    return round(60000 / beat_length, 2)
+
+def parse_content(md5: str, content: bytes) -> IndexedBeatmap:
+    return parse_beatmap(md5, io.TextIOWrapper(io.BytesIO(content), encoding='utf-8-sig', errors='replace'))
+
+def parse_stored(md5: str) -> IndexedBeatmap:
+    """parse a map we already have, from .data or the pack store"""
+    if pack_store is not None:
+        return parse_content(md5, pack_store.read(md5))
+
+    with open(beatmap_files.directory / f"{md5}.osu", encoding='utf-8-sig', errors='replace') as f:
+        return parse_beatmap(md5, f)
+
+def search_query(query: str) -> Optional[str]:
+    """every word as a quoted prefix, so user input can't reach fts5's query syntax"""
+    terms = SEARCH_TERM.findall(query)
+    return ' '.join(f'"{term}"*' for term in terms) or None
+
+class MapIndex:
+    def __init__(self, path: str, batch_size: int = 200) -> None:
+        """
+        metadata of every .osu we keep (artist, title, difficulty, bpm, length,
+        object counts) in sqlite with full text search, so searching and looking
+        up maps never needs the api. maps are indexed as they're downloaded,
+        whatever was cached before this existed is backfilled in the background.
+        """
+        self.db = SQLiteDatabase(path)
+        self.batch_size = batch_size
+        self.connected: bool = False
+
+        self.known: Set[str] = set()
+        self.queue: asyncio.Queue[Tuple[str, bytes]] = asyncio.Queue()
+        self._task: Optional[asyncio.Task] = None
+        self._backfill: Optional[asyncio.Task] = None
+
+        self.indexed: int = 0
+        self.failed: int = 0
+        self.backfill_pending: int = 0
+        self.searches: int = 0
+        self.lookups: int = 0
+        self.lookup_hits: int = 0
+
+    def __len__(self) -> int:
+        return len(self.known)
+
+    def __contains__(self, md5: str) -> bool:
+        return md5 in self.known
+
+    async def connect(self) -> None:
+        await self.db.connect()
+        for statement in SCHEMA:
+            await self.db.execute(statement)
+
+        rows = await self.db.fetchall('select md5 from beatmaps', _dict=False)
+        self.known = {row[0] for row in rows}
+        self.connected = True
+
+        self._task = asyncio.create_task(self._run())
+        self._backfill = asyncio.create_task(self.backfill())
+
+    async def close(self) -> None:
+        self.connected = False
+
+        for task in (self._task, self._backfill):
+            if task is not None:
+                task.cancel()
+
+        self._task = self._backfill = None
+        await self.db.close()
+
+    def submit(self, md5: str, content: bytes) -> None:
+        """index a freshly downloaded map, written with whatever else came in meanwhile"""
+        if self.connected and md5 not in self.known:
+            self.queue.put_nowait((md5, content))
+
+    def _parse_many(self, items: List[Tuple[str, Optional[bytes]]]) -> List[IndexedBeatmap]:
+        parsed = []
+
+        for md5, content in items:
+            try:
+                parsed.append(parse_stored(md5) if content is None else parse_content(md5, content))
+            except FileNotFoundError:
+                pass # NOTE: evicted since we listed it
+            except Exception as e:
+                self.failed += 1
+                log(f"failed to index beatmap {md5}: {e}", Ansi.YELLOW)
+
+        return parsed
+
+    async def put_many(self, beatmaps: List[IndexedBeatmap]) -> None:
+        if not beatmaps:
+            return
+
+        columns = IndexedBeatmap._fields + ('indexed_at',)
+        now = int(time.time())
+
+        await self.db.executemany(
+            self.db.build_upsert('beatmaps', ('md5',), columns, 1),
+            [(*beatmap, now) for beatmap in beatmaps]
+        )
+
+        self.known.update(beatmap.md5 for beatmap in beatmaps)
+        self.indexed += len(beatmaps)
+
+    async def _run(self) -> None:
+        while True:
+            items = [await self.queue.get()]
+            while len(items) < self.batch_size and not self.queue.empty():
+                items.append(self.queue.get_nowait())
+
+            try:
+                await self.put_many(await asyncio.to_thread(self._parse_many, items))
+            except Exception as e:
+                log(f"error writing the beatmap index: {e}", Ansi.YELLOW)
+
+    async def backfill(self) -> None:
+        """index whatever is cached but not indexed yet, a batch at a time"""
+        stored = pack_store.index if pack_store is not None else beatmap_files.index
+        missing = [md5 for md5 in list(stored) if md5 not in self.known]
+        if not missing:
+            return
+
+        self.backfill_pending = len(missing)
+        indexed = self.indexed
+
+        try:
+            for i in range(0, len(missing), self.batch_size):
+                batch = [(md5, None) for md5 in missing[i:i + self.batch_size]]
+                await self.put_many(await asyncio.to_thread(self._parse_many, batch))
+                self.backfill_pending -= len(batch)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            log(f"error backfilling the beatmap index: {e}", Ansi.YELLOW)
+            return
+
+        log(f"indexed {self.indexed - indexed} cached beatmaps for search", Ansi.LGREEN)
+
+    async def search(self, query: str, limit: int = 10) -> List[Dict[str, Any]]:
+        """best matches first, one row per beatmap id (newest version)"""
+        match = search_query(query)
+        if match is None or not self.connected:
+            return []
+
+        self.searches += 1
+
+        # NOTE: bm25 weights follow the column order, title and artist count the most
+        rows = await self.db.fetchall(
+            f'select {COLUMNS} '
+            'from beatmaps_search join beatmaps on beatmaps.rowid = beatmaps_search.rowid '
+            'where beatmaps_search match %s '
+            'order by bm25(beatmaps_search, 4.0, 4.0, 2.0, 2.0, 1.0), beatmaps.indexed_at desc limit %s',
+            [match, limit * 2]
+        )
+
+        results: List[Dict[str, Any]] = []
+        seen: Set[int] = set()
+
+        for row in rows:
+            # XXX: maps from before beatmap ids were in the file all have 0
+            if row['id'] and row['id'] in seen:
+                continue
+
+            seen.add(row['id'])
+            results.append(row)
+
+        return results[:limit]
+
+    async def get(self, beatmap_id: int) -> Optional[Dict[str, Any]]:
+        """
+        the newest version of a map we have locally, None if we never downloaded it.
+        could be outdated if the map was updated since, same as our .osu would be.
+        """
+        # NOTE: 0 is every map from before ids were written into the file
+        if not self.connected or not beatmap_id:
+            return None
+
+        self.lookups += 1
+        row = await self.db.fetch(
+            f'select {COLUMNS} from beatmaps where beatmap_id = %s order by indexed_at desc limit 1',
+            [beatmap_id]
+        )
+
+        if row is not None:
+            self.lookup_hits += 1
+
+        return row
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'count': len(self.known),
+            'indexed': self.indexed,
+            'failed': self.failed,
+            'queued': self.queue.qsize(),
+            'backfill_pending': self.backfill_pending,
+            'searches': self.searches,
+            'lookups': self.lookups,
+            'lookup_hits': self.lookup_hits,
+        }
+
+map_index = MapIndex(config.map_index_path)
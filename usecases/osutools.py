@@ -0,0 +1,286 @@
+from __future__ import annotations
+
+import asyncio
+import itertools
+import orjson
+import os
+import time
+import config
+
+from typing import Any, Dict, List, Optional, Sequence, Set
+
+from utils.database import LatencyHistogram
+from utils.logging import log, Ansi
+from usecases.packstore import PACK_PREFIX, PackStore, pack_store
+from usecases.performance import ScoreParams, build_simulate_args, osu_tools_result
+
+class WorkerDied(Exception):
+    """the worker exited or stopped answering"""
+
+class WorkerUnavailable(Exception):
+    """the workers can't be started here (no dotnet, worker not built)"""
+
+class OsuToolsWorker:
+    def __init__(self, command: Sequence[str]) -> None:
+        """
+        one resident PerformanceCalculator, speaking one json object per line:
+
+            -> {"id": 1, "args": ["simulate", "osu", "map.osu", "-a", "98"]}
+            <- {"id": 1, "ok": true, "output": "<what the cli would have printed>"}
+            -> {"id": 2, "ping": true}
+            <- {"id": 2, "ok": true, "output": "pong"}
+
+        failures come back as {"id": .., "ok": false, "error": ".."}.
+        """
+        self.command = command
+        self.process: Optional[asyncio.subprocess.Process] = None
+        self.ids = itertools.count(1)
+
+    @property
+    def alive(self) -> bool:
+        return self.process is not None and self.process.returncode is None
+
+    async def start(self) -> None:
+        self.process = await asyncio.create_subprocess_exec(
+            *self.command,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            limit=1024 * 1024 # NOTE: one response line per job, can be long in debug builds
+        )
+
+    def kill(self) -> None:
+        if self.alive:
+            try:
+                self.process.kill()
+            except ProcessLookupError:
+                pass
+
+    async def request(self, payload: Dict[str, Any], timeout: float) -> str:
+        if not self.alive:
+            raise WorkerDied("worker is not running")
+
+        request_id = next(self.ids)
+        self.process.stdin.write(orjson.dumps({'id': request_id, **payload}) + b'\n')
+
+        try:
+            await self.process.stdin.drain()
+
+            while True:
+                line = await asyncio.wait_for(self.process.stdout.readline(), timeout=timeout)
+                if not line:
+                    raise WorkerDied(f"worker exited with {await self.process.wait()}")
+
+                response = orjson.loads(line)
+
+                # XXX: a late answer to a job we already gave up on
+                if response.get('id') == request_id:
+                    break
+        except (asyncio.TimeoutError, ConnectionError, orjson.JSONDecodeError) as e:
+            # NOTE: whatever it's doing, it's not answering us anymore
+            self.kill()
+            raise WorkerDied(f"worker stopped answering: {e!r}") from e
+
+        if not response.get('ok'):
+            raise RuntimeError(response.get('error') or "worker error")
+
+        return response['output']
+
+UNAVAILABLE_RETRY = 60.0 # seconds before trying to start workers that failed to start again
+
+class OsuToolsPool:
+    def __init__(self, command: Sequence[str], workers: int = 2,
+                 timeout: float = 30.0, health_interval: float = 30.0) -> None:
+        """
+        keeps `workers` osu-tools processes resident so a score costs one
+        simulate call instead of a dotnet startup. dead or stuck workers are
+        replaced, both when a job fails and by a periodic ping.
+        """
+        self.command = command
+        self.workers = workers
+        self.timeout = timeout
+        self.health_interval = health_interval
+
+        self.idle: asyncio.Queue[OsuToolsWorker] = asyncio.Queue()
+        # NOTE: checked out by a job or the health check, close has to get these too
+        self.busy: Set[OsuToolsWorker] = set()
+        self.started: bool = False
+        self._start_lock = asyncio.Lock()
+        self._health_task: Optional[asyncio.Task] = None
+        # NOTE: when starting last failed, spawning dotnet for every job to fail again is pointless
+        self._unavailable: Optional[str] = None
+        self._unavailable_at: float = 0.0
+
+        self.completed: int = 0
+        self.failed: int = 0
+        self.restarts: int = 0
+        self.run_time = LatencyHistogram()
+
+    async def start(self) -> None:
+        # XXX: started on first use, most setups never calculate with osu-tools
+        async with self._start_lock:
+            if self.started:
+                return
+
+            if self._unavailable is not None and time.monotonic() - self._unavailable_at < UNAVAILABLE_RETRY:
+                raise WorkerUnavailable(self._unavailable)
+
+            workers: List[OsuToolsWorker] = []
+            try:
+                for _ in range(self.workers):
+                    worker = OsuToolsWorker(self.command)
+                    workers.append(worker)
+                    await worker.start()
+
+                    # NOTE: dotnet starts fine without the dll, only an answer proves it works
+                    await worker.request({'ping': True}, timeout=self.timeout)
+            except (OSError, WorkerDied) as e:
+                for worker in workers:
+                    worker.kill()
+
+                self._unavailable = f"couldn't start osu-tools workers: {e!r}"
+                self._unavailable_at = time.monotonic()
+                raise WorkerUnavailable(self._unavailable) from e
+
+            self._unavailable = None
+
+            for worker in workers:
+                self.idle.put_nowait(worker)
+
+            self._health_task = asyncio.create_task(self._health())
+            self.started = True
+
+            log(f"started {self.workers} osu-tools workers", Ansi.LGREEN)
+
+    async def close(self) -> None:
+        if self._health_task is not None:
+            self._health_task.cancel()
+            self._health_task = None
+
+        while not self.idle.empty():
+            worker = self.idle.get_nowait()
+            if worker.alive:
+                worker.process.stdin.close() # NOTE: eof is the worker's cue to exit
+                try:
+                    await asyncio.wait_for(worker.process.wait(), timeout=5)
+                except asyncio.TimeoutError:
+                    worker.kill()
+
+        # XXX: mid-job, nobody is getting that answer anymore. killed here,
+        #      not returned to idle once the job fails (see _checkin)
+        for worker in self.busy:
+            worker.kill()
+
+        self.busy.clear()
+        self.started = False
+
+    async def _checkout(self) -> OsuToolsWorker:
+        worker = await self.idle.get()
+        self.busy.add(worker)
+        return worker
+
+    def _checkin(self, worker: OsuToolsWorker) -> None:
+        self.busy.discard(worker)
+
+        # NOTE: closed while it was out, don't let it back into a future pool
+        if not self.started:
+            worker.kill()
+            return
+
+        self.idle.put_nowait(worker)
+
+    async def _restart(self, worker: OsuToolsWorker) -> OsuToolsWorker:
+        """replace a checked out worker, the replacement is checked out in its place"""
+        worker.kill()
+        self.restarts += 1
+
+        replacement = OsuToolsWorker(self.command)
+        self.busy.add(replacement)
+        try:
+            await replacement.start()
+        except Exception as e:
+            # NOTE: keep the dead one around, the next job or health check tries again
+            log(f"failed to restart an osu-tools worker: {e}", Ansi.RED)
+            self.busy.discard(replacement)
+            return worker
+
+        self.busy.discard(worker)
+        return replacement
+
+    async def _health(self) -> None:
+        while True:
+            await asyncio.sleep(self.health_interval)
+
+            # NOTE: only idle workers, busy ones prove themselves by answering
+            for _ in range(self.idle.qsize()):
+                worker = self.idle.get_nowait()
+                self.busy.add(worker)
+
+                try:
+                    await worker.request({'ping': True}, timeout=5)
+                except Exception as e:
+                    log(f"osu-tools worker failed its health check: {e}", Ansi.YELLOW)
+                    worker = await self._restart(worker)
+
+                self._checkin(worker)
+
+    async def run(self, args: List[str], timeout: Optional[float] = None) -> str:
+        """one PerformanceCalculator invocation, returns its output"""
+        if not self.started:
+            await self.start()
+
+        worker = await self._checkout()
+        started_at = time.perf_counter()
+
+        try:
+            if not worker.alive:
+                worker = await self._restart(worker)
+
+            output = await worker.request({'args': args}, timeout=timeout or self.timeout)
+        except WorkerDied:
+            self.failed += 1
+            if self.started:
+                worker = await self._restart(worker)
+            raise
+        except Exception:
+            self.failed += 1
+            raise
+        finally:
+            self._checkin(worker)
+
+        self.run_time.observe((time.perf_counter() - started_at) * 1000)
+        self.completed += 1
+
+        return output
+
+    async def simulate(self, osu_file_path: str, score: ScoreParams, timeout: Optional[float] = None) -> Dict[str, Any]:
+        """one score, raises instead of falling back to 0pp"""
+        temp_path = None
+
+        if PackStore.is_ref(osu_file_path):
+            temp_path = await asyncio.to_thread(pack_store.materialize, osu_file_path[len(PACK_PREFIX):])
+            osu_file_path = temp_path
+
+        try:
+            return osu_tools_result(await self.run(build_simulate_args(osu_file_path, score), timeout))
+        finally:
+            if temp_path is not None:
+                os.unlink(temp_path)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'workers': self.workers,
+            'started': self.started,
+            'idle': self.idle.qsize(),
+            'busy': len(self.busy),
+            'completed': self.completed,
+            'failed': self.failed,
+            'restarts': self.restarts,
+            'run_time_p50_ms': self.run_time.percentile(0.5),
+            'run_time_p95_ms': self.run_time.percentile(0.95),
+        }
+
+osu_tools = OsuToolsPool(
+    command=config.osu_tools_worker,
+    workers=config.osu_tools_workers,
+    timeout=config.osu_tools_timeout
+)
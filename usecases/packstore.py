@@ -0,0 +1,175 @@
+from __future__ import annotations
+
+import hashlib
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import zlib
+import config
+
+from pathlib import Path
+from typing import Any, Dict, NamedTuple, Optional
+
+PACK_PREFIX = "pack://"
+
+# md5 (raw), pack number, offset, compressed length, raw length
+INDEX_RECORD = struct.Struct('<16sHQII')
+
+class PackEntry(NamedTuple):
+    pack: int
+    offset: int
+    length: int
+    size: int
+
+class PackStore:
+    def __init__(self, directory: Path, max_pack_bytes: int = 256 * 1024 * 1024, level: int = 6) -> None:
+        """
+        content addressed store for .osu files, zlib compressed blobs appended
+        to a few large pack files plus an append-only md5 index.
+
+        reads go through mmap, so the only copy is the decompressed map handed
+        to the parser. other processes (the pp pool) pick up new entries by
+        reading the tail of the index when they miss.
+        """
+        self.directory = directory
+        self.max_pack_bytes = max_pack_bytes
+        self.level = level
+
+        self.index: Dict[str, PackEntry] = {}
+        self._index_pos: int = 0
+        self._current_pack: int = 0
+        self._maps: Dict[int, mmap.mmap] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def index_path(self) -> Path:
+        return self.directory / "index"
+
+    def pack_path(self, pack: int) -> Path:
+        return self.directory / f"pack-{pack:04d}.pack"
+
+    def __len__(self) -> int:
+        self._refresh()
+        return len(self.index)
+
+    def __contains__(self, md5: str) -> bool:
+        return self.get_entry(md5) is not None
+
+    @staticmethod
+    def ref(md5: str) -> str:
+        """what download_map hands to calculate_performances instead of a path"""
+        return f"{PACK_PREFIX}{md5}"
+
+    @staticmethod
+    def is_ref(path: str) -> bool:
+        return path.startswith(PACK_PREFIX)
+
+    def _refresh(self) -> None:
+        """read index records appended since we last looked"""
+        with self._lock:
+            try:
+                with open(self.index_path, 'rb') as f:
+                    f.seek(self._index_pos)
+                    data = f.read()
+            except FileNotFoundError:
+                return
+
+            usable = len(data) - len(data) % INDEX_RECORD.size # XXX: a record being written right now
+            for raw_md5, pack, offset, length, size in INDEX_RECORD.iter_unpack(data[:usable]):
+                self.index[raw_md5.hex()] = PackEntry(pack, offset, length, size)
+                self._current_pack = max(self._current_pack, pack)
+
+            self._index_pos += usable
+
+    def get_entry(self, md5: str) -> Optional[PackEntry]:
+        entry = self.index.get(md5)
+        if entry is None:
+            self._refresh()
+            entry = self.index.get(md5)
+
+        return entry
+
+    def _map(self, pack: int, end: int) -> mmap.mmap:
+        mapped = self._maps.get(pack)
+
+        # NOTE: the newest pack keeps growing, remap once it outgrew our view
+        if mapped is None or len(mapped) < end:
+            if mapped is not None:
+                mapped.close()
+
+            with open(self.pack_path(pack), 'rb') as f:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+            self._maps[pack] = mapped
+
+        return mapped
+
+    def read(self, md5: str) -> bytes:
+        entry = self.get_entry(md5)
+        if entry is None:
+            raise KeyError(md5)
+
+        with self._lock:
+            mapped = self._map(entry.pack, entry.offset + entry.length)
+            with memoryview(mapped) as view:
+                return zlib.decompress(view[entry.offset:entry.offset + entry.length], bufsize=entry.size)
+
+    def add(self, content: bytes) -> str:
+        """store a map, returns its md5"""
+        md5 = hashlib.md5(content).hexdigest()
+        if md5 in self:
+            return md5
+
+        compressed = zlib.compress(content, self.level)
+
+        with self._lock:
+            self.directory.mkdir(parents=True, exist_ok=True)
+
+            pack = self._current_pack
+            path = self.pack_path(pack)
+            offset = path.stat().st_size if path.exists() else 0
+
+            if offset and offset + len(compressed) > self.max_pack_bytes:
+                pack, offset = pack + 1, 0
+                path = self.pack_path(pack)
+
+            # NOTE: blob first, index record last, a crash in between only leaves unreferenced bytes
+            with open(path, 'ab') as f:
+                f.write(compressed)
+                f.flush()
+                os.fsync(f.fileno())
+
+            with open(self.index_path, 'ab') as f:
+                f.write(INDEX_RECORD.pack(bytes.fromhex(md5), pack, offset, len(compressed), len(content)))
+
+        self._refresh()
+        return md5
+
+    def materialize(self, md5: str) -> str:
+        """write a map out to a temp file for tools that need a path, the caller deletes it"""
+        fd, path = tempfile.mkstemp(suffix=".osu")
+        with os.fdopen(fd, "wb") as f:
+            f.write(self.read(md5))
+
+        return path
+
+    def close(self) -> None:
+        with self._lock:
+            for mapped in self._maps.values():
+                mapped.close()
+            self._maps.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        self._refresh()
+        packs = {entry.pack for entry in self.index.values()}
+
+        return {
+            'count': len(self.index),
+            'packs': len(packs),
+            'bytes': sum(entry.length for entry in self.index.values()),
+            'raw_bytes': sum(entry.size for entry in self.index.values()),
+        }
+
+pack_store: Optional[PackStore] = PackStore(Path(config.beatmap_pack_dir)) if config.beatmap_store == 'pack' else None
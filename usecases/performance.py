@@ -3,23 +3,31 @@
 
 from __future__ import annotations
 
+import asyncio
 import math
 import re
 import orjson
 import subprocess
 import os
+import threading
+import time
 import config
 
+from collections import OrderedDict
 from collections.abc import Iterable
 from dataclasses import dataclass
-from typing import TypedDict, Iterable, Dict, Any, Tuple
+from typing import TypedDict, Iterable, Dict, Any, Tuple, Optional, NamedTuple, Sequence, List
 from utils.logging import log, Ansi
+from utils.cache import TTLCache, MISSING
 from pathlib import Path
 
 from refx_pp_py import Beatmap
 from refx_pp_py import Calculator
 
 from utils.OsuMapping import Mods, modstr2mod_dict
+from usecases.executor import pp_pool
+from usecases.ppcache import pp_cache, score_key, normalize_mods
+from usecases.packstore import PACK_PREFIX, PackStore, pack_store
 
 
 @dataclass
@@ -69,8 +77,221 @@ class PerformanceResult(TypedDict):
     performance: Performance
     difficulty: Difficulty
 
-def calculate_performances(osu_file_path: str, scores: Iterable[ScoreParams]) -> list[PerformanceResult]:
-    calc_ = Beatmap(path=osu_file_path)
+class BeatmapCache:
+    def __init__(self, max_entries: int, max_bytes: int) -> None:
+        """
+        lru of parsed beatmaps keyed by md5, parsing dominates pp calculation
+        for long maps. a parsed map's size in memory scales with its .osu file,
+        so the file size is what counts against `max_bytes`.
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+
+        # md5 -> (parsed map, file size, seconds it took to parse)
+        self.entries: OrderedDict[str, Tuple[Beatmap, int, float]] = OrderedDict()
+        self.bytes: int = 0
+        self._lock = threading.Lock()
+
+        self.hits: int = 0
+        self.misses: int = 0
+        self.parse_time: float = 0.0
+        self.parse_time_saved: float = 0.0
+
+    def get(self, key: str, osu_file_path: str) -> Beatmap:
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                self.parse_time_saved += entry[2]
+                return entry[0]
+
+        start = time.perf_counter()
+        if PackStore.is_ref(osu_file_path):
+            # NOTE: decompressed straight out of the pack mmap into the parser
+            content = pack_store.read(osu_file_path[len(PACK_PREFIX):])
+            beatmap = Beatmap(bytes=content)
+            size = len(content)
+        else:
+            beatmap = Beatmap(path=osu_file_path)
+            size = os.path.getsize(osu_file_path)
+        elapsed = time.perf_counter() - start
+
+        with self._lock:
+            self.misses += 1
+            self.parse_time += elapsed
+
+            if key not in self.entries and size <= self.max_bytes:
+                self.entries[key] = (beatmap, size, elapsed)
+                self.bytes += size
+
+                while len(self.entries) > self.max_entries or self.bytes > self.max_bytes:
+                    _, (_, evicted_size, _) = self.entries.popitem(last=False)
+                    self.bytes -= evicted_size
+
+        return beatmap
+
+    def clear(self) -> None:
+        with self._lock:
+            self.entries.clear()
+            self.bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+
+        return {
+            'size': len(self.entries),
+            'bytes': self.bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'parse_time': self.parse_time,
+            'parse_time_saved': self.parse_time_saved,
+        }
+
+beatmap_cache = BeatmapCache(
+    max_entries=config.beatmap_cache_entries,
+    max_bytes=config.beatmap_cache_mb * 1024 * 1024
+)
+
+# NOTE: a Calculator only holds its parameters, so any two scores
+#       with the exact same parameters can share one
+calculator_cache: TTLCache[Tuple, Calculator] = TTLCache(maxsize=256)
+_calculator_lock = threading.Lock()
+
+def get_calculator(score: ScoreParams, beatmap_key: Optional[str] = None, difficulty: Any = None) -> Calculator:
+    """
+    `difficulty` (with the `beatmap_key` it belongs to) is baked into the
+    calculator, so a calculator never changes once it's in the cache.
+    """
+    key = (
+        beatmap_key if difficulty is not None else None,
+        score.mode, score.mods or 0, score.combo, score.acc,
+        score.n300, score.n100, score.n50, score.ngeki, score.nkatu, score.nmiss,
+        score.AC, score.AR, score.TW, score.CS, score.HD
+    )
+
+    with _calculator_lock:
+        calculator = calculator_cache.get(key)
+        if calculator is not MISSING:
+            return calculator
+
+    calculator = Calculator(
+        mode=score.mode % 4,
+        mods=score.mods or 0,
+        combo=score.combo,
+        acc=score.acc,
+        n300=score.n300,
+        n100=score.n100,
+        n50=score.n50,
+        n_geki=score.ngeki,
+        n_katu=score.nkatu,
+        n_misses=score.nmiss,
+        # NOTE: for refx
+        shaymi_mode=True if score.mode > 3 else False
+    )
+
+    # NOTE: for refx
+    if score.mode > 3:
+        calculator.cheat_ac(0 if score.AC is None or score.AC < 1 else score.AC)
+        calculator.cheat_arc(score.AR if score.AR is not None else 0)
+        calculator.cheat_tw(int(150 if score.TW < 1 else score.TW))
+        calculator.cheat_cs(bool(score.CS))
+        calculator.cheat_hdr(bool(score.HD))
+    else:
+        calculator.cheat_ac(0 if score.AC is None or score.AC < 1 else score.AC)
+        calculator.cheat_arc(score.AR if score.AR is not None else 0)
+        calculator.cheat_hdr(bool(score.HD))
+
+    if difficulty is not None:
+        calculator.set_difficulty(difficulty)
+
+    with _calculator_lock:
+        calculator_cache.set(key, calculator)
+
+    return calculator
+
+# NOTE: star rating and strains only depend on the map, these mods and the refx cheat values
+DIFFICULTY_IGNORED_MODS = (
+    Mods.NOFAIL.value | Mods.SUDDENDEATH.value | Mods.PERFECT.value | Mods.SPUNOUT.value
+)
+
+# XXX: older calculator builds can't take precomputed attributes, everything still works without
+SUPPORTS_SET_DIFFICULTY = hasattr(Calculator, 'difficulty') and hasattr(Calculator, 'set_difficulty')
+
+# (map, mode, mods, cheats) -> (calculator's own attributes, Difficulty)
+difficulty_cache: TTLCache[Tuple, Tuple[Any, Difficulty]] = TTLCache(maxsize=1024)
+_difficulty_lock = threading.Lock()
+
+def difficulty_key(beatmap_key: str, score: ScoreParams) -> Tuple:
+    return (
+        beatmap_key, score.mode, normalize_mods(score.mods) & ~DIFFICULTY_IGNORED_MODS,
+        score.AC, score.AR, score.TW, score.CS, score.HD
+    )
+
+def to_difficulty(attributes: Any) -> Difficulty:
+    return {
+        "stars": attributes.stars,
+        "aim": attributes.aim,
+        "speed": attributes.speed,
+        "flashlight": attributes.flashlight,
+        "slider_factor": attributes.slider_factor,
+        "speed_note_count": attributes.speed_note_count,
+        "stamina": attributes.stamina,
+        "color": attributes.color,
+        "rhythm": attributes.rhythm,
+        "peak": attributes.peak,
+    }
+
+def get_difficulty(beatmap: Beatmap, beatmap_key: str, score: ScoreParams) -> Tuple[Any, Difficulty]:
+    key = difficulty_key(beatmap_key, score)
+
+    with _difficulty_lock:
+        cached = difficulty_cache.get(key)
+        if cached is not MISSING:
+            return cached
+
+    attributes = get_calculator(score).difficulty(beatmap)
+    cached = (attributes, to_difficulty(attributes))
+
+    with _difficulty_lock:
+        difficulty_cache.set(key, cached)
+
+    return cached
+
+def performance_cache_stats() -> Dict[str, Any]:
+    """this process' caches, with a process pool that's a pp_pool worker's (see merge_cache_stats)"""
+    return {
+        'beatmaps': beatmap_cache.stats(),
+        'calculators': calculator_cache.stats(),
+        'difficulty': {**difficulty_cache.stats(), 'enabled': SUPPORTS_SET_DIFFICULTY},
+    }
+
+def merge_cache_stats(samples: Sequence[Dict[str, Any]]) -> Dict[str, Any]:
+    """performance_cache_stats of every worker summed up, hit rates recomputed"""
+    merged: Dict[str, Any] = {'workers': len(samples)}
+
+    for name in ('beatmaps', 'calculators', 'difficulty'):
+        section: Dict[str, Any] = {'hits': 0, 'misses': 0}
+
+        for sample in samples:
+            for key, value in sample[name].items():
+                # NOTE: limits and flags are the same everywhere, counters add up
+                if key == 'maxsize' or isinstance(value, bool):
+                    section[key] = value
+                elif key != 'hit_rate':
+                    section[key] = section.get(key, 0) + value
+
+        lookups = section['hits'] + section['misses']
+        section['hit_rate'] = section['hits'] / lookups if lookups else 0.0
+        merged[name] = section
+
+    return merged
+
+def calculate_performances(osu_file_path: str, scores: Iterable[ScoreParams],
+                           beatmap_md5: Optional[str] = None) -> list[PerformanceResult]:
+    beatmap_key = beatmap_md5 or osu_file_path
+    calc_ = beatmap_cache.get(beatmap_key, osu_file_path)
 
     results: list[PerformanceResult] = []
 
@@ -86,32 +307,13 @@ def calculate_performances(osu_file_path: str, scores: Iterable[ScoreParams]) ->
             if score.mods & Mods.NIGHTCORE.value:
                 score.mods |= Mods.DOUBLETIME.value
 
-        calculator = Calculator(
-            mode=score.mode % 4,
-            mods=score.mods or 0,
-            combo=score.combo,
-            acc=score.acc,
-            n300=score.n300,
-            n100=score.n100,
-            n50=score.n50,
-            n_geki=score.ngeki,
-            n_katu=score.nkatu,
-            n_misses=score.nmiss,
-            # NOTE: for refx
-            shaymi_mode=True if score.mode > 3 else False
-        )
-
-        # NOTE: for refx
-        if score.mode > 3:
-            calculator.cheat_ac(0 if score.AC is None or score.AC < 1 else score.AC)
-            calculator.cheat_arc(score.AR if score.AR is not None else 0)
-            calculator.cheat_tw(int(150 if score.TW < 1 else score.TW))
-            calculator.cheat_cs(bool(score.CS))
-            calculator.cheat_hdr(bool(score.HD))
+        # NOTE: difficulty is the expensive half, only pay it once per map/mods/cheats
+        if SUPPORTS_SET_DIFFICULTY:
+            attributes, difficulty = get_difficulty(calc_, beatmap_key, score)
+            calculator = get_calculator(score, beatmap_key, attributes)
         else:
-            calculator.cheat_ac(0 if score.AC is None or score.AC < 1 else score.AC)
-            calculator.cheat_arc(score.AR if score.AR is not None else 0)
-            calculator.cheat_hdr(bool(score.HD))
+            difficulty = None
+            calculator = get_calculator(score)
 
         result = calculator.performance(calc_)
 
@@ -133,28 +335,125 @@ def calculate_performances(osu_file_path: str, scores: Iterable[ScoreParams]) ->
                     "effective_miss_count": result.effective_miss_count,
                     "pp_difficulty": result.pp_difficulty,
                 },
-                "difficulty": {
-                    "stars": result.difficulty.stars,
-                    "aim": result.difficulty.aim,
-                    "speed": result.difficulty.speed,
-                    "flashlight": result.difficulty.flashlight,
-                    "slider_factor": result.difficulty.slider_factor,
-                    "speed_note_count": result.difficulty.speed_note_count,
-                    "stamina": result.difficulty.stamina,
-                    "color": result.difficulty.color,
-                    "rhythm": result.difficulty.rhythm,
-                    "peak": result.difficulty.peak,
-                },
+                "difficulty": difficulty or to_difficulty(result.difficulty),
             },
         )
 
     return results
 
+class PerformanceJob(NamedTuple):
+    osu_file_path: str
+    beatmap_md5: str
+    score: ScoreParams
+
+def group_jobs(jobs: Sequence[PerformanceJob]) -> Dict[str, Tuple[str, List[int], List[ScoreParams]]]:
+    """md5 -> (path, indices into `jobs`, scores), so each map is parsed once"""
+    groups: Dict[str, Tuple[str, List[int], List[ScoreParams]]] = {}
+
+    for i, job in enumerate(jobs):
+        _, indices, scores = groups.setdefault(job.beatmap_md5, (job.osu_file_path, [], []))
+        indices.append(i)
+        scores.append(job.score)
+
+    return groups
+
+async def calculate_performances_parallel(jobs: Sequence[PerformanceJob]) -> list[PerformanceResult]:
+    """
+    calculate many scores over many maps, results in the same order as `jobs`.
+    every map is one pp_pool job, scores that were calculated before come
+    straight from pp_cache.
+    """
+    keys = [score_key(job.beatmap_md5, job.score) for job in jobs]
+    cached = await pp_cache.get_many(keys)
+
+    results: list[PerformanceResult] = [cached.get(key) for key in keys]
+    missing = [i for i, result in enumerate(results) if result is None]
+
+    if not missing:
+        return results
+
+    groups = group_jobs([jobs[i] for i in missing])
+
+    # NOTE: no more in flight than the pool can run at once, the rest wait here instead
+    #       of in pp_pool's queue, so a big batch can't hit PoolBusy (or starve other commands)
+    in_flight = asyncio.Semaphore(pp_pool.workers)
+
+    async def submit(md5: str, path: str, scores: List[ScoreParams]) -> list[PerformanceResult]:
+        async with in_flight:
+            return await pp_pool.submit(calculate_performances, path, scores, md5)
+
+    group_results = await asyncio.gather(*[
+        submit(md5, path, scores)
+        for md5, (path, _, scores) in groups.items()
+    ])
+
+    for (_, indices, _), calculated in zip(groups.values(), group_results):
+        for i, result in zip(indices, calculated):
+            results[missing[i]] = result
+
+    await pp_cache.put_many([(keys[i], results[i]) for i in missing])
+
+    return results
+
+# --- pp grid (!map) ---
+GRID_ACCURACIES = (95.0, 97.0, 98.0, 99.0, 100.0)
+GRID_MODS = (
+    Mods.NOMOD.value,
+    Mods.HIDDEN.value,
+    Mods.HARDROCK.value,
+    Mods.DOUBLETIME.value,
+    Mods.HIDDEN.value | Mods.DOUBLETIME.value,
+    Mods.HIDDEN.value | Mods.HARDROCK.value,
+)
+
+class PerformanceGridRow(NamedTuple):
+    mods: int
+    stars: float
+    pp: Tuple[float, ...] # NOTE: one per GRID_ACCURACIES
+
+# (md5, mode) -> mods -> row, a map's grid never changes
+pp_grid_cache: TTLCache[Tuple[str, int], Dict[int, PerformanceGridRow]] = TTLCache(maxsize=512)
+
+def grid_score(mode: int, mods: int, acc: float) -> ScoreParams:
+    # NOTE: full combo, no misses, refx cheats off
+    return ScoreParams(mode=mode, mods=mods, acc=acc, nmiss=0, AC=0, AR=0, TW=0, CS=False, HD=False)
+
+async def calculate_pp_grid(osu_file_path: str, beatmap_md5: str, mode: int,
+                            mods: Sequence[int] = GRID_MODS) -> List[PerformanceGridRow]:
+    """pp for every GRID_ACCURACIES x `mods` combination, one row per mods"""
+    rows = pp_grid_cache.get((beatmap_md5, mode), None) or {}
+    missing = [m for m in mods if m not in rows]
+
+    if missing:
+        # NOTE: all on the same map, so calculate_performances_parallel makes it one job and one parse
+        results = await calculate_performances_parallel([
+            PerformanceJob(osu_file_path, beatmap_md5, grid_score(mode, m, acc))
+            for m in missing for acc in GRID_ACCURACIES
+        ])
+
+        for n, m in enumerate(missing):
+            row = results[n * len(GRID_ACCURACIES):(n + 1) * len(GRID_ACCURACIES)]
+            rows[m] = PerformanceGridRow(
+                mods=m,
+                stars=round(float(row[0]['difficulty']['stars']), 2),
+                pp=tuple(round(result['performance']['pp'], 2) for result in row)
+            )
+
+        pp_grid_cache.set((beatmap_md5, mode), rows)
+
+    return [rows[m] for m in mods]
+
 # --- osu-tools ---
 # NOTE: just an attempt, tee-hee
 #       THIS IS VERY SLOW, DONT USE
 #       shoulda used rosu-pp    
+# NOTE: paths that passed, a failed check runs again next time so installing dotnet doesn't need a restart
+_verified_paths: set[str] = set()
+
 def verify_paths(osu_tools_path: str) -> bool:
+    if osu_tools_path in _verified_paths:
+        return True
+
     calculator_path = Path(osu_tools_path) / "PerformanceCalculator" / "bin" / "Release" / "net8.0" / "PerformanceCalculator.dll"
     
     # XXX: check if dotnet is installed
@@ -167,9 +466,16 @@ def verify_paths(osu_tools_path: str) -> bool:
     if not calculator_path.exists():
         log(f"PerformanceCalculator not found at: {calculator_path}", Ansi.YELLOW)
         return False
-        
+
+    _verified_paths.add(osu_tools_path)
     return True
 
+PERFORMANCE_PATTERNS = {
+    "pp": re.compile(r"pp\s+:\s*([\d,]+\.?\d*)"),
+    "star_rating": re.compile(r"star rating\s+:\s*([\d,]+\.?\d*)"),
+    "max_combo": re.compile(r"max combo\s+:\s*([\d,]+\.?\d*)"),
+}
+
 def parse_performance_output(output: str) -> Tuple[float, Dict[str, float]]:
     """for simulate"""
     performance = {
@@ -178,15 +484,9 @@ def parse_performance_output(output: str) -> Tuple[float, Dict[str, float]]:
     }
     
     pp_value = 0.0
-
-    patterns = {
-        "pp": r"pp\s+:\s*([\d,]+\.?\d*)",
-        "star_rating": r"star rating\s+:\s*([\d,]+\.?\d*)",
-        "max_combo": r"max combo\s+:\s*([\d,]+\.?\d*)",
-    }
     
-    for key, pattern in patterns.items():
-        match = re.search(pattern, output)
+    for key, pattern in PERFORMANCE_PATTERNS.items():
+        match = pattern.search(output)
         if match:
             value = match.group(1).replace(",", "")
             if key == "pp":
@@ -196,7 +496,63 @@ def parse_performance_output(output: str) -> Tuple[float, Dict[str, float]]:
     
     return pp_value, performance
 
-def calculate_osu_tools(osu_file_path: str, scores: Iterable[ScoreParams], osu_tools_base_path: str = '../osutools') -> list[Dict[str, Any]]:
+def osu_tools_result(output: str) -> Dict[str, Any]:
+    pp_value, performance_attrs = parse_performance_output(output)
+
+    return {
+        "performance": {
+            "pp": pp_value
+        },
+        "difficulty": {
+            "stars": performance_attrs["star_rating"],
+            "max_combo": performance_attrs["max_combo"]
+        },
+    }
+
+def osu_tools_fallback() -> Dict[str, Any]:
+    return {
+        "performance": {"pp": 0.0},
+        "difficulty": {"stars": 0.0}
+    }
+
+OSU_TOOLS_MODES = {
+    0: "osu",
+    1: "taiko",
+    2: "catch",
+    3: "mania"
+}
+
+def build_simulate_args(osu_file_path: str, score: ScoreParams) -> List[str]:
+    """PerformanceCalculator arguments for one score, everything after the dll"""
+    args = ['simulate', OSU_TOOLS_MODES.get(score.mode, 'osu'), osu_file_path]
+
+    if score.n50 is not None:
+        args.extend(['-M', str(score.n50)])
+    
+    if score.mode == 3:
+        if score.combo is not None:
+            args.extend(['-s', str(score.combo)])
+    else:
+        if score.combo is not None:
+            args.extend(['-c', str(score.combo)])
+        if score.nmiss is not None:
+            args.extend(['-X', str(score.nmiss)])
+    
+    if score.mode not in [2, 3] and score.n100 is not None:
+        args.extend(['-G', str(score.n100)])
+    
+    if score.acc is not None:
+        args.extend(['-a', str(score.acc)])
+    
+    if score.mods is not None:
+        for mod_str, mod_value in modstr2mod_dict.items():
+            # XXX: remove nc because dt is always active if nc is active
+            if score.mods & mod_value.value and mod_str not in {"NM", "V2", "NC"}:
+                args.extend(['-m', mod_str])
+
+    return args
+
+def calculate_osu_tools(osu_file_path: str, scores: Iterable[ScoreParams], osu_tools_base_path: str = config.osu_tools_path) -> list[Dict[str, Any]]:
     """
     Calculate performance using osu-tools
     
@@ -214,54 +570,13 @@ def calculate_osu_tools(osu_file_path: str, scores: Iterable[ScoreParams], osu_t
     if not os.path.exists(osu_file_path):
         raise FileNotFoundError(f"Beatmap file not found: {osu_file_path}")
 
-    calculator_path = os.path.join(
-        osu_tools_base_path,
-        "PerformanceCalculator/bin/Release/net8.0/PerformanceCalculator.dll"
-    )
+    calculator_path = osu_tools_calculator_path(osu_tools_base_path)
     
     results: list[Dict[str, Any]] = []
 
-    # TODO: dont make the mode mapping here??
-    mode_mapping = {
-        0: "osu",
-        1: "taiko",
-        2: "catch",
-        3: "mania"
-    }
-
     for score in scores:
         try:
-            cmd = [
-                'dotnet',
-                calculator_path,
-                'simulate',
-                mode_mapping.get(score.mode, 'osu'),
-                osu_file_path
-            ]
-            
-            if score.n50 is not None:
-                cmd.extend(['-M', str(score.n50)])
-            
-            if score.mode == 3:
-                if score.combo is not None:
-                    cmd.extend(['-s', str(score.combo)])
-            else:
-                if score.combo is not None:
-                    cmd.extend(['-c', str(score.combo)])
-                if score.nmiss is not None:
-                    cmd.extend(['-X', str(score.nmiss)])
-            
-            if score.mode not in [2, 3] and score.n100 is not None:
-                cmd.extend(['-G', str(score.n100)])
-            
-            if score.acc is not None:
-                cmd.extend(['-a', str(score.acc)])
-            
-            if score.mods is not None:
-                for mod_str, mod_value in modstr2mod_dict.items():
-                    # XXX: remove nc because dt is always active if nc is active
-                    if score.mods & mod_value.value and mod_str not in {"NM", "V2", "NC"}:
-                        cmd.extend(['-m', mod_str])
+            cmd = ['dotnet', calculator_path, *build_simulate_args(osu_file_path, score)]
             
             try:
                 calc_process = subprocess.run(
@@ -277,17 +592,7 @@ def calculate_osu_tools(osu_file_path: str, scores: Iterable[ScoreParams], osu_t
                 if calc_process.stderr and config.DEBUG:
                     log(f"performance calculator stderr: {calc_process.stderr}")
                 
-                pp_value, performance_attrs = parse_performance_output(calc_process.stdout)
-                
-                results.append({
-                    "performance": {
-                        "pp": pp_value
-                    },
-                    "difficulty": {
-                        "stars": performance_attrs["star_rating"],
-                        "max_combo": performance_attrs["max_combo"]
-                    },
-                })
+                results.append(osu_tools_result(calc_process.stdout))
                 
             except subprocess.CalledProcessError as e:
                 log(f"command failed: {' '.join(e.cmd)}")
@@ -298,9 +603,107 @@ def calculate_osu_tools(osu_file_path: str, scores: Iterable[ScoreParams], osu_t
                 
         except Exception as e:
             log(f"error calculating performance for score: {e}", Ansi.RED)
-            results.append({ # fallback
-                "performance": {"pp": 0.0},
-                "difficulty": {"stars": 0.0}
-            })
+            results.append(osu_tools_fallback())
     
-    return results
\ No newline at end of file
+    return results
+
+def osu_tools_calculator_path(osu_tools_base_path: str) -> str:
+    return os.path.join(
+        osu_tools_base_path,
+        "PerformanceCalculator/bin/Release/net8.0/PerformanceCalculator.dll"
+    )
+
+# NOTE: shared by every calculate_osu_tools_async call, created lazily inside the loop
+_osu_tools_slots: Optional[asyncio.Semaphore] = None
+
+async def simulate_osu_tools(cmd: List[str], timeout: float) -> str:
+    """one dotnet simulate run, killed if it outlives `timeout`"""
+    global _osu_tools_slots
+    if _osu_tools_slots is None:
+        _osu_tools_slots = asyncio.Semaphore(config.osu_tools_concurrency)
+
+    async with _osu_tools_slots:
+        process = await asyncio.create_subprocess_exec(
+            *cmd,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE
+        )
+
+        try:
+            stdout, stderr = await asyncio.wait_for(process.communicate(), timeout=timeout)
+        except BaseException:
+            # XXX: timed out or cancelled, don't leave dotnet running in the background
+            if process.returncode is None:
+                process.kill()
+                await process.wait()
+            raise
+
+    if config.DEBUG:
+        log(f"Running command: {' '.join(cmd)}")
+        log(f"Stdout: {stdout.decode()}")
+
+    if stderr and config.DEBUG:
+        log(f"performance calculator stderr: {stderr.decode()}")
+
+    if process.returncode != 0:
+        raise subprocess.CalledProcessError(process.returncode, cmd, stdout.decode(), stderr.decode())
+
+    return stdout.decode()
+
+async def calculate_osu_tools_async(
+    osu_file_path: str,
+    scores: Iterable[ScoreParams],
+    osu_tools_base_path: str = config.osu_tools_path,
+    timeout: Optional[float] = None,
+    fallback: bool = True
+) -> list[Dict[str, Any]]:
+    """
+    calculate_osu_tools without blocking the event loop, every score is its own
+    dotnet process and up to OSU_TOOLS_CONCURRENCY of them run at once.
+
+    a score that fails comes back as 0pp, or raises with `fallback=False`.
+    """
+    if not await asyncio.to_thread(verify_paths, osu_tools_base_path):
+        raise EnvironmentError("Required paths or executables not found")
+
+    temp_path = None
+
+    # NOTE: osu-tools wants a real file
+    if PackStore.is_ref(osu_file_path):
+        temp_path = await asyncio.to_thread(pack_store.materialize, osu_file_path[len(PACK_PREFIX):])
+        osu_file_path = temp_path
+    elif not os.path.exists(osu_file_path):
+        raise FileNotFoundError(f"Beatmap file not found: {osu_file_path}")
+
+    calculator_path = osu_tools_calculator_path(osu_tools_base_path)
+
+    try:
+        outputs = await asyncio.gather(*[
+            simulate_osu_tools(
+                ['dotnet', calculator_path, *build_simulate_args(osu_file_path, score)],
+                timeout or config.osu_tools_timeout
+            )
+            for score in scores
+        ], return_exceptions=True)
+    finally:
+        if temp_path is not None:
+            os.unlink(temp_path)
+
+    results: list[Dict[str, Any]] = []
+    for output in outputs:
+        if isinstance(output, subprocess.CalledProcessError):
+            log(f"command failed: {' '.join(output.cmd)}")
+            log(f"return code: {output.returncode}")
+            log(f"stdout: {output.stdout}")
+            log(f"stderr: {output.stderr}")
+
+        if isinstance(output, BaseException):
+            if not fallback:
+                raise output
+
+            log(f"error calculating performance for score: {output!r}", Ansi.RED)
+            results.append(osu_tools_fallback())
+        else:
+            results.append(osu_tools_result(output))
+
+    return results
@@ -0,0 +1,127 @@
+from __future__ import annotations
+
+import orjson
+import config
+
+from importlib import metadata
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Sequence, Tuple
+
+from utils.cache import TTLCache, MISSING
+from utils.logging import log, Ansi
+from utils.OsuMapping import Mods
+from utils.sqlite import SQLiteDatabase
+
+if TYPE_CHECKING:
+    from usecases.performance import PerformanceResult, ScoreParams
+
+try:
+    CALCULATOR_VERSION = metadata.version('refx_pp_py')
+except metadata.PackageNotFoundError:
+    CALCULATOR_VERSION = 'unknown'
+
+# NOTE: bump whenever the shape of PerformanceResult changes
+CACHE_VERSION = f"1:{CALCULATOR_VERSION}"
+
+def normalize_mods(mods: Optional[int]) -> int:
+    """nightcore is doubletime as far as pp goes"""
+    mods = mods or 0
+
+    if mods & Mods.NIGHTCORE.value:
+        mods = (mods & ~Mods.NIGHTCORE.value) | Mods.DOUBLETIME.value
+
+    return mods
+
+def score_key(beatmap_md5: str, score: ScoreParams) -> str:
+    """everything that can change a calculate_performances result"""
+    return ':'.join(map(str, (
+        CACHE_VERSION, beatmap_md5, score.mode, normalize_mods(score.mods),
+        score.acc, score.combo, score.nmiss,
+        score.n300, score.n100, score.n50, score.ngeki, score.nkatu,
+        # NOTE: refx cheat values
+        score.AC, score.AR, score.TW, score.CS, score.HD
+    )))
+
+class PerformanceCache:
+    def __init__(self, path: str, memory_size: int = 4096) -> None:
+        """memoized calculate_performances results, in memory lru then sqlite on disk"""
+        self.memory: TTLCache[str, PerformanceResult] = TTLCache(maxsize=memory_size)
+        self.disk = SQLiteDatabase(path)
+        self.connected: bool = False
+
+        self.disk_hits: int = 0
+        self.misses: int = 0
+
+    async def connect(self) -> None:
+        await self.disk.connect()
+        await self.disk.execute(
+            'create table if not exists pp_cache ('
+            'key text primary key, version text not null, result blob not null)'
+        )
+
+        # XXX: results from another calculator version are never read again
+        await self.disk.execute('delete from pp_cache where version != %s', [CACHE_VERSION])
+        self.connected = True
+
+    async def close(self) -> None:
+        self.connected = False
+        await self.disk.close()
+
+    async def get_many(self, keys: Sequence[str]) -> Dict[str, PerformanceResult]:
+        found: Dict[str, PerformanceResult] = {}
+        missing: List[str] = []
+
+        for key in keys:
+            result = self.memory.get(key)
+            if result is not MISSING:
+                found[key] = result
+            else:
+                missing.append(key)
+
+        if missing and self.connected:
+            try:
+                rows = await self.disk.fetchall(
+                    f"select key, result from pp_cache where key in ({', '.join(['%s'] * len(missing))})",
+                    missing
+                )
+            except Exception as e:
+                log(f"failed to read the pp cache: {e}", Ansi.YELLOW)
+                rows = ()
+
+            for row in rows:
+                result = orjson.loads(row['result'])
+                self.memory.set(row['key'], result)
+                found[row['key']] = result
+
+            self.disk_hits += len(rows)
+
+        self.misses += len(keys) - len(found)
+        return found
+
+    async def put_many(self, items: Sequence[Tuple[str, PerformanceResult]]) -> None:
+        for key, result in items:
+            self.memory.set(key, result)
+
+        if not items or not self.connected:
+            return
+
+        try:
+            await self.disk.executemany(
+                self.disk.build_upsert('pp_cache', ('key',), ('key', 'version', 'result'), 1),
+                [(key, CACHE_VERSION, orjson.dumps(result)) for key, result in items]
+            )
+        except Exception as e:
+            log(f"failed to write the pp cache: {e}", Ansi.YELLOW)
+
+    def stats(self) -> Dict[str, Any]:
+        memory = self.memory.stats()
+        lookups = memory['hits'] + self.disk_hits + self.misses
+
+        return {
+            'memory_size': memory['size'],
+            'memory_hits': memory['hits'],
+            'disk_hits': self.disk_hits,
+            'misses': self.misses,
+            'hit_rate': (memory['hits'] + self.disk_hits) / lookups if lookups else 0.0,
+        }
+
+pp_cache = PerformanceCache(config.pp_cache_path)
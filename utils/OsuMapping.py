@@ -16,45 +16,11 @@ class Mode(Enum):
 
     @classmethod
     def from_string(cls, mode_str: str) -> "Mode":
-        mode_mapping = {
-            "vn!std": cls.VN_STD,
-            "vn!taiko": cls.VN_TAIKO,
-            "vn!catch": cls.VN_CATCH,
-            "vn!mania": cls.VN_MANIA,
-            "rx!std": cls.RX_STD,
-            "rx!taiko": cls.RX_TAIKO,
-            "rx!catch": cls.RX_CATCH,
-            "rx!mania": cls.RX_MANIA,
-            "ap!std": cls.AP_STD,
-
-            # NOTE: refx mapping
-            "001!std": cls.VN_STD,
-            "001!taiko": cls.VN_TAIKO,
-            "001!catch": cls.VN_CATCH,
-            "001!mania": cls.VN_MANIA,
-            "002!std": cls.RX_STD,
-            "002!taiko": cls.RX_TAIKO,
-            "002!catch": cls.RX_CATCH,
-            "002!mania": cls.RX_MANIA,
-        }
-
-        return mode_mapping.get(mode_str.lower(), cls.VN_STD).value
+        return MODE_BY_NAME.get(mode_str.lower(), cls.VN_STD.value)
 
     @classmethod
     def to_string(cls, mode_id: int) -> str:
-        int2mode = {
-            0: "001!std",
-            1: "001!taiko",
-            2: "001!catch",
-            3: "001!mania",
-            4: "002!std",
-            5: "002!taiko",
-            6: "002!catch",
-            7: "002!mania",
-            8: "ap!std"
-        }
-        
-        return int2mode.get(mode_id, "001!std")
+        return MODE_NAMES.get(mode_id, "001!std")
     
 class Mods(Enum):
     NOMOD = 0
@@ -91,24 +57,19 @@ class Mods(Enum):
     MIRROR = 1 << 30
     
     @classmethod
-    def from_modstr(cls, s: str) -> Mods:
-        mods = cls.NOMOD
-        mod_strs = [s[idx:idx + 2].upper() for idx in range(0, len(s), 2)]
-        
-        for mod in mod_strs:
-            mods |= modstr2mod_dict.get(mod, cls.NOMOD)
+    def from_modstr(cls, s: str) -> int:
+        """mods bitmask for a string like `HDDT`, unknown pairs are ignored."""
+        s = s.upper()
+        mods = 0
+
+        for idx in range(0, len(s), 2):
+            mods |= MOD_BITS.get(s[idx:idx + 2], 0)
 
         return mods
 
     @classmethod
     def to_modstr(cls, mods_value: int) -> str:
-        mod_strs = []
-
-        for mod_str, mod in modstr2mod_dict.items():
-            if mods_value & mod.value:
-                mod_strs.append(mod_str)
-
-        return ''.join(mod_strs)
+        return ''.join(mod_str for mod_str, bit in MOD_BITS.items() if mods_value & bit)
 
 
     
@@ -147,6 +108,52 @@ modstr2mod_dict = {
     "NM": Mods.NOMOD
 }
 
+# NOTE: built once, Mode/Mods and utils.args look everything up in these
+MOD_BITS = {mod_str: mod.value for mod_str, mod in modstr2mod_dict.items()}
+
+MODE_BY_NAME = {
+    "vn!std": Mode.VN_STD.value,
+    "vn!taiko": Mode.VN_TAIKO.value,
+    "vn!catch": Mode.VN_CATCH.value,
+    "vn!ctb": Mode.VN_CATCH.value,
+    "vn!mania": Mode.VN_MANIA.value,
+    "rx!std": Mode.RX_STD.value,
+    "rx!taiko": Mode.RX_TAIKO.value,
+    "rx!catch": Mode.RX_CATCH.value,
+    "rx!ctb": Mode.RX_CATCH.value,
+    "rx!mania": Mode.RX_MANIA.value,
+    "ap!std": Mode.AP_STD.value,
+
+    # NOTE: refx mapping
+    "001!std": Mode.VN_STD.value,
+    "001!taiko": Mode.VN_TAIKO.value,
+    "001!catch": Mode.VN_CATCH.value,
+    "001!mania": Mode.VN_MANIA.value,
+    "002!std": Mode.RX_STD.value,
+    "002!taiko": Mode.RX_TAIKO.value,
+    "002!catch": Mode.RX_CATCH.value,
+    "002!mania": Mode.RX_MANIA.value,
+
+    # NOTE: bare names are vanilla
+    "std": Mode.VN_STD.value,
+    "taiko": Mode.VN_TAIKO.value,
+    "catch": Mode.VN_CATCH.value,
+    "ctb": Mode.VN_CATCH.value,
+    "mania": Mode.VN_MANIA.value,
+}
+
+MODE_NAMES = {
+    0: "001!std",
+    1: "001!taiko",
+    2: "001!catch",
+    3: "001!mania",
+    4: "002!std",
+    5: "002!taiko",
+    6: "002!catch",
+    7: "002!mania",
+    8: "ap!std"
+}
+
 # actually why did i even make this..
 osrparseMod_dict = {
     'nf': osrparse.Mod.NoFail,
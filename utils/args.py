@@ -4,7 +4,8 @@ from utils.OsuMapping import Mode
 
 from typing import Tuple, Optional
 from discord.ext import commands
-from objects import glob
+from utils.grammar import ArgumentError, CommandArgs, parse_command
+from utils.linkHelper import LinkHelper
 
 class ArgParsing:
     def __init__(self) -> None:
@@ -12,49 +13,47 @@ class ArgParsing:
         self.mode = Mode
 
     async def parse_args(self, ctx: commands.Context, args: str) -> Tuple[Optional[str], Optional[int]]:
-        user_id = str(ctx.author.id)
-        username = ""
-        mode = 0
+        parsed = await ArgParsing.resolve(ctx, args)
+        if parsed is None:
+            return None, None
+
+        return parsed.username, parsed.mode
+
+    @staticmethod
+    async def resolve(ctx: commands.Context, args: Optional[str]) -> Optional[CommandArgs]:
+        """parsed args with username and mode filled in, None (and the user told why) if that failed."""
+        try:
+            parsed = parse_command(args)
+        except ArgumentError as e:
+            await ctx.send(str(e))
+            return None
 
         mentioned_users = ctx.message.mentions
         mentioned_users = [user for user in mentioned_users if user.id != ctx.bot.user.id]
 
         if mentioned_users:  # NOTE: !pf @user
-            mentioned_user = str(mentioned_users[0].id)
+            mentioned_user = mentioned_users[0].id
             try:
-                result = await glob.db.fetch('select name, mode from users where id = %s', [mentioned_user])
-                if result:
-                    username = result['name']
-                    mode = result['mode']
+                link = await LinkHelper().get_osu(mentioned_user)
+                if link:
+                    parsed.username = link[0]
+                    parsed.mode = link[1] if parsed.mode is None else parsed.mode
                 else:
                     await ctx.send(f"user <@{mentioned_user}> not found in the database.")
-                    return None, None
+                    return None
             except Exception as err:
                 await ctx.send(f"error retrieving profile from database: {err}")
-                return None, None
-        else:
-            if args:
-                if args.startswith('+'):
-                    parts = args[1:].split(None, 1)
-                    mode = self.mode.from_string(parts[0])
-                    if len(parts) > 1:
-                        username = parts[1].strip()
-                else:
-                    parts = args.split('+')
-                    if len(parts) > 1:
-                        username = parts[0].strip()
-                        mode = self.mode.from_string(parts[1].strip())
-                    else:
-                        username = args.strip()
-
-            if not username:
-                result = await glob.db.fetch('select name, mode from users where id = %s', [user_id])
-                if result:
-                    username = result['name']
-                    mode = result['mode'] if mode == 0 else mode
-                else:
-                    await ctx.send("no profile set. Use `!setprofile <name> (mode)` to set a default profile.")
-                    return None, None
-        #log(username)
-        #log(mode)
-        return username, mode
\ No newline at end of file
+                return None
+        elif not parsed.username:
+            link = await LinkHelper().get_osu(ctx.author.id)
+            if link:
+                parsed.username = link[0]
+                parsed.mode = link[1] if parsed.mode is None else parsed.mode
+            else:
+                await ctx.send("no profile set. Use `!setprofile <name> (mode)` to set a default profile.")
+                return None
+
+        if parsed.mode is None:
+            parsed.mode = 0
+
+        return parsed
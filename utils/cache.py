@@ -0,0 +1,76 @@
+from __future__ import annotations
+
+import time
+
+from collections import OrderedDict
+from typing import Any, Dict, Generic, Hashable, Optional, Tuple, TypeVar
+
+K = TypeVar('K', bound=Hashable)
+V = TypeVar('V')
+
+# NOTE: returned on a miss, so cached `None`s (negative entries) can be told apart
+MISSING: Any = object()
+
+class TTLCache(Generic[K, V]):
+    def __init__(self, maxsize: int, ttl: Optional[float] = None) -> None:
+        """bounded lru cache, entries optionally expire after `ttl` seconds"""
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.data: OrderedDict[K, Tuple[Optional[float], V]] = OrderedDict()
+
+        self.hits: int = 0
+        self.misses: int = 0
+        self.evictions: int = 0
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    def __contains__(self, key: K) -> bool:
+        return self.get(key, count=False) is not MISSING
+
+    def get(self, key: K, default: Any = MISSING, count: bool = True) -> V:
+        entry = self.data.get(key)
+
+        if entry is not None:
+            expires_at, value = entry
+            if expires_at is None or expires_at > time.monotonic():
+                self.data.move_to_end(key)
+                if count:
+                    self.hits += 1
+                return value
+
+            del self.data[key]
+
+        if count:
+            self.misses += 1
+        return default
+
+    def set(self, key: K, value: V, ttl: Optional[float] = None) -> None:
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.monotonic() + ttl if ttl is not None else None
+
+        self.data[key] = (expires_at, value)
+        self.data.move_to_end(key)
+
+        while len(self.data) > self.maxsize:
+            self.data.popitem(last=False)
+            self.evictions += 1
+
+    def pop(self, key: K, default: Any = None) -> Any:
+        entry = self.data.pop(key, None)
+        return entry[1] if entry is not None else default
+
+    def clear(self) -> None:
+        self.data.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+
+        return {
+            'size': len(self.data),
+            'maxsize': self.maxsize,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+        }
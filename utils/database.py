@@ -0,0 +1,259 @@
+from __future__ import annotations
+
+import asyncio
+import bisect
+import re
+import time
+
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+import aiomysql
+
+from cmyui.mysql import AsyncSQLPool
+from pymysql.err import InterfaceError, OperationalError
+
+from utils.logging import log, Ansi
+
+# NOTE: client side "lost the server" errors from pymysql,
+#       CR_CONN_HOST_ERROR, CR_SERVER_GONE_ERROR, CR_SERVER_LOST, CR_SERVER_LOST_EXTENDED
+CONNECTION_ERROR_CODES = {2003, 2006, 2013, 2055}
+
+# upper bounds in ms, last bucket catches everything else
+LATENCY_BUCKETS: Tuple[float, ...] = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, float('inf'))
+
+_whitespace = re.compile(r'\s+')
+_values_rows = re.compile(r'(\(%s(?:, %s)*\))(?:, \1)+') # multi-row inserts from the write-behind queue
+_in_lists = re.compile(r'\b(in) \(%s(?:, %s)*\)', re.IGNORECASE) # `where id in (...)` over a chunk of ids
+
+def is_connection_error(error: BaseException) -> bool:
+    """the server or the socket is gone, a timeout is not that"""
+    if isinstance(error, (ConnectionError, InterfaceError)):
+        return True
+
+    if isinstance(error, OperationalError):
+        return bool(error.args) and error.args[0] in CONNECTION_ERROR_CODES
+
+    return False
+
+class LatencyHistogram:
+    __slots__ = ('counts', 'total_ms', 'max_ms', 'errors')
+
+    def __init__(self) -> None:
+        self.counts: List[int] = [0] * len(LATENCY_BUCKETS)
+        self.total_ms: float = 0.0
+        self.max_ms: float = 0.0
+        self.errors: int = 0
+
+    @property
+    def count(self) -> int:
+        return sum(self.counts)
+
+    def observe(self, ms: float) -> None:
+        self.counts[bisect.bisect_left(LATENCY_BUCKETS, ms)] += 1
+        self.total_ms += ms
+        self.max_ms = max(self.max_ms, ms)
+
+    def percentile(self, p: float) -> float:
+        """upper bound of the bucket the `p` percentile falls into"""
+        target = self.count * p
+        seen = 0
+
+        for bound, count in zip(LATENCY_BUCKETS, self.counts):
+            seen += count
+            if seen >= target and count:
+                return min(bound, self.max_ms)
+
+        return self.max_ms
+
+def normalize_statement(query: str) -> str:
+    """one histogram key per statement, whatever the whitespace/row count/`in` list length"""
+    statement = _values_rows.sub(r'\1, ...', _whitespace.sub(' ', query).strip())
+    return _in_lists.sub(r'\1 (%s, ...)', statement)
+
+class QueryStats:
+    def __init__(self, slow_query_ms: float) -> None:
+        """per-statement latency histograms and a slow query log"""
+        self.slow_query_ms = slow_query_ms
+        self.histograms: Dict[str, LatencyHistogram] = {}
+
+    def histogram(self, query: str) -> Tuple[str, LatencyHistogram]:
+        statement = normalize_statement(query)
+        histogram = self.histograms.get(statement)
+        if histogram is None:
+            histogram = self.histograms[statement] = LatencyHistogram()
+
+        return statement, histogram
+
+    def observe(self, statement: str, histogram: LatencyHistogram, elapsed: float) -> None:
+        histogram.observe(elapsed)
+
+        if elapsed >= self.slow_query_ms:
+            log(f"slow query ({elapsed:.1f}ms): {statement}", Ansi.LYELLOW)
+
+    def hottest(self, top: int) -> List[Dict[str, Any]]:
+        """the `top` statements by total time spent"""
+        hottest = sorted(self.histograms.items(), key=lambda item: item[1].total_ms, reverse=True)[:top]
+
+        return [
+            {
+                'query': statement,
+                'count': histogram.count,
+                'errors': histogram.errors,
+                'total_ms': histogram.total_ms,
+                'p50_ms': histogram.percentile(0.5),
+                'p95_ms': histogram.percentile(0.95),
+                'max_ms': histogram.max_ms,
+            }
+            for statement, histogram in hottest
+        ]
+
+class Database(QueryStats):
+    def __init__(self, config: Dict[str, Any], timeout: float = 5.0,
+                 retries: int = 2, slow_query_ms: float = 250.0) -> None:
+        """
+        thin layer over cmyui's AsyncSQLPool, same fetch/fetchall/execute api.
+
+        every query gets a timeout and is timed into a per-statement histogram,
+        reads (and writes flagged idempotent) are retried instead of failing the
+        command. connection errors rebuild the pool first, a timeout only throws
+        away the connection it happened on.
+        """
+        super().__init__(slow_query_ms)
+
+        self.config = config
+        self.timeout = timeout
+        self.retries = retries
+
+        self.pool: Optional[AsyncSQLPool] = None
+        self._reconnect_lock = asyncio.Lock()
+
+        self.retried: int = 0
+        self.reconnects: int = 0
+        self.timeouts: int = 0
+
+    async def connect(self) -> None:
+        pool = AsyncSQLPool()
+        await pool.connect(self.config)
+        self.pool = pool
+
+    async def close(self) -> None:
+        if self.pool is not None:
+            await self.pool.close()
+            self.pool = None
+
+    async def reconnect(self, broken: Optional[AsyncSQLPool] = None) -> None:
+        """rebuild the pool, once, no matter how many queries noticed it broke"""
+        async with self._reconnect_lock:
+            if broken is not None and self.pool is not broken:
+                return # someone else already rebuilt it
+
+            old, self.pool = self.pool, None
+            if old is not None:
+                try:
+                    await old.close()
+                except Exception:
+                    pass
+
+            await self.connect()
+            self.reconnects += 1
+            log('reconnected to MySQL', Ansi.LYELLOW)
+
+    @staticmethod
+    async def _query(pool: AsyncSQLPool, query: str, params: Sequence[Any],
+                     fetch: Optional[str] = None, _dict: bool = True) -> Any:
+        """AsyncSQLPool.fetch/execute, but a connection interrupted mid-query never goes back to the pool"""
+        conn = await pool.pool.acquire()
+
+        try:
+            async with conn.cursor(aiomysql.DictCursor if _dict else aiomysql.Cursor) as cur:
+                await cur.execute(query, params)
+
+                if fetch == 'all':
+                    return await cur.fetchall()
+                if fetch == 'one':
+                    return await cur.fetchone()
+
+                await conn.commit()
+                return cur.lastrowid
+        except BaseException as e:
+            # XXX: cancelled by wait_for (or the socket died) with results possibly still
+            #      unread, closed connections are dropped by release instead of reused
+            if isinstance(e, asyncio.CancelledError) or is_connection_error(e):
+                conn.close()
+            raise
+        finally:
+            pool.pool.release(conn)
+
+    async def fetch(self, query: str, params: Sequence[Any] = [],
+                    _all: bool = False, _dict: bool = True) -> Any:
+        fetch = 'all' if _all else 'one'
+        return await self._run(query, lambda pool: self._query(pool, query, params, fetch, _dict), idempotent=True)
+
+    async def fetchall(self, query: str, params: Sequence[Any] = [], _dict: bool = True) -> Any:
+        return await self.fetch(query, params, _all=True, _dict=_dict)
+
+    async def execute(self, query: str, params: Sequence[Any] = [], idempotent: bool = False) -> int:
+        return await self._run(query, lambda pool: self._query(pool, query, params), idempotent=idempotent)
+
+    async def _run(self, query: str, call: Callable[[AsyncSQLPool], Awaitable[Any]], idempotent: bool) -> Any:
+        statement, histogram = self.histogram(query)
+        attempts = self.retries + 1 if idempotent else 1
+
+        for attempt in range(attempts):
+            pool = self.pool
+            start = time.perf_counter()
+
+            try:
+                if pool is None:
+                    raise ConnectionError('not connected to MySQL')
+
+                result = await asyncio.wait_for(call(pool), timeout=self.timeout)
+            except Exception as e:
+                histogram.errors += 1
+                timed_out = isinstance(e, asyncio.TimeoutError)
+                self.timeouts += timed_out
+
+                if not timed_out and not is_connection_error(e):
+                    raise
+
+                if attempt + 1 >= attempts:
+                    raise
+
+                self.retried += 1
+                log(f"retrying query after {type(e).__name__}: {statement}", Ansi.YELLOW)
+
+                await asyncio.sleep(0.05 * 2 ** attempt)
+
+                # NOTE: one slow query says nothing about the pool, everyone else keeps their connections
+                if timed_out:
+                    continue
+
+                try:
+                    await self.reconnect(pool)
+                except Exception as re_err:
+                    log(f"failed to reconnect to MySQL: {re_err}", Ansi.RED)
+
+                continue
+
+            self.observe(statement, histogram, (time.perf_counter() - start) * 1000)
+            return result
+
+    @staticmethod
+    def build_upsert(table: str, key: Tuple[str, ...], columns: Tuple[str, ...], rows: int) -> str:
+        """multi-row `insert ... on duplicate key update` with `rows` placeholder groups"""
+        placeholders = f"({', '.join(['%s'] * len(columns))})"
+        updates = ', '.join(f"{column} = values({column})" for column in columns if column not in key)
+
+        return (
+            f"insert into {table} ({', '.join(columns)}) "
+            f"values {', '.join([placeholders] * rows)} "
+            f"on duplicate key update {updates}"
+        )
+
+    def stats(self, top: int = 5) -> Dict[str, Any]:
+        return {
+            'retried': self.retried,
+            'reconnects': self.reconnects,
+            'timeouts': self.timeouts,
+            'statements': self.hottest(top),
+        }
@@ -0,0 +1,182 @@
+from __future__ import annotations
+
+import operator
+import re
+
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from utils.OsuMapping import MOD_BITS, MODE_BY_NAME
+
+class ArgumentError(ValueError):
+    """args that don't parse, the message is meant for the user"""
+
+MENTION = re.compile(r"<@!?\d+>")
+FILTER = re.compile(r"(acc|pp|combo|miss)(>=|<=|!=|[<>=])(\d+(?:\.\d+)?)%?", re.IGNORECASE)
+
+# flag -> CommandArgs slot, compare is the only one without a value
+FLAGS = {
+    '-c': 'compare',
+    '--compare': 'compare',
+    '-p': 'page',
+    '--page': 'page',
+    '-s': 'sort',
+    '--sort': 'sort',
+}
+
+# what `-s` and filters accept -> score key
+SORT_KEYS = {
+    'pp': 'pp',
+    'acc': 'acc',
+    'combo': 'max_combo',
+    'miss': 'nmiss',
+    'score': 'score',
+    'date': 'play_time',
+}
+FILTER_FIELDS = {
+    'acc': 'acc',
+    'pp': 'pp',
+    'combo': 'max_combo',
+    'miss': 'nmiss',
+}
+OPERATORS: Dict[str, Callable[[Any, Any], bool]] = {
+    '>': operator.gt,
+    '>=': operator.ge,
+    '<': operator.lt,
+    '<=': operator.le,
+    '=': operator.eq,
+    '!=': operator.ne,
+}
+
+class ScoreFilter(NamedTuple):
+    key: str
+    op: str
+    value: float
+
+    def matches(self, score: Dict[str, Any]) -> bool:
+        return OPERATORS[self.op](float(score[self.key]), self.value)
+
+class CommandArgs:
+    __slots__ = ('username', 'mode', 'mods', 'page', 'sort', 'compare', 'filters')
+
+    def __init__(self) -> None:
+        self.username: Optional[str] = None
+        self.mode: Optional[int] = None # NOTE: None is "not given", not std
+        self.mods: Optional[int] = None
+        self.page: int = 0 # NOTE: 0-based, `-p 1` is the first page
+        self.sort: Optional[str] = None # score key
+        self.compare: bool = False
+        self.filters: Tuple[ScoreFilter, ...] = ()
+
+    def __repr__(self) -> str:
+        return f"CommandArgs({', '.join(f'{slot}={getattr(self, slot)!r}' for slot in self.__slots__)})"
+
+    @property
+    def narrowed(self) -> bool:
+        """True if mods or filters can drop scores"""
+        return self.mods is not None or bool(self.filters)
+
+    def matches(self, score: Dict[str, Any]) -> bool:
+        if self.mods is not None:
+            # NOTE: +NM is nomod only, anything else is "at least these"
+            if self.mods == 0 and score['mods'] != 0:
+                return False
+            if score['mods'] & self.mods != self.mods:
+                return False
+
+        return all(score_filter.matches(score) for score_filter in self.filters)
+
+    def apply(self, scores: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """filtered and sorted, in the api's order when there's no -s"""
+        if self.narrowed:
+            scores = [score for score in scores if self.matches(score)]
+
+        if self.sort is not None:
+            # XXX: fewer misses is better, everything else is bigger first
+            scores = sorted(scores, key=lambda score: score[self.sort], reverse=self.sort != 'nmiss')
+
+        return scores
+
+def parse_mods(modstr: str) -> int:
+    """bitmask for `HDDT`, ArgumentError on anything that isn't a mod"""
+    modstr = modstr.upper()
+    if len(modstr) % 2:
+        raise ArgumentError(f"unknown mods `+{modstr}`, use something like `+HDDT`.")
+
+    mods = 0
+    for idx in range(0, len(modstr), 2):
+        bit = MOD_BITS.get(modstr[idx:idx + 2])
+        if bit is None:
+            raise ArgumentError(f"unknown mods `+{modstr}`, use something like `+HDDT`.")
+        mods |= bit
+
+    return mods
+
+def _set_value(parsed: CommandArgs, slot: str, value: str) -> None:
+    if slot == 'page':
+        if not value.isdigit() or int(value) < 1:
+            raise ArgumentError(f"`{value}` isn't a page number.")
+        parsed.page = int(value) - 1
+    else:
+        key = SORT_KEYS.get(value.lower())
+        if key is None:
+            raise ArgumentError(f"can't sort by `{value}`, try one of {', '.join(SORT_KEYS)}.")
+        parsed.sort = key
+
+def parse_command(args: Optional[str]) -> CommandArgs:
+    """
+    tokenize osu! command args once, e.g. `ano +rx!std +HD acc>=98 -s pp -p 2 -c`.
+
+    `+x!y` (or a bare `+std`) is a mode, any other `+` is mods, `-c`/`-p`/`-s`
+    are flags and `acc>=98` style tokens are filters. whatever is left over
+    is the username.
+    """
+    parsed = CommandArgs()
+    if not args:
+        return parsed
+
+    words: List[str] = []
+    filters: List[ScoreFilter] = []
+    pending: Optional[str] = None # NOTE: flag still waiting for its value
+
+    # NOTE: one pass over whitespace separated tokens, dispatched on the first
+    #       character. the replace is what splits `name+rx!std`
+    for token in args.replace('+', ' +').split():
+        first = token[0]
+
+        if pending is not None:
+            _set_value(parsed, pending, token)
+            pending = None
+        elif first == '+':
+            if len(token) == 1:
+                continue
+
+            value = token[1:]
+            mode = MODE_BY_NAME.get(value.lower())
+
+            if mode is not None:
+                parsed.mode = mode
+            elif '!' in value:
+                raise ArgumentError(f"unknown mode `{token}`, use something like `+rx!std`.")
+            else:
+                parsed.mods = parse_mods(value)
+        elif first == '-' and token.lower() in FLAGS:
+            slot = FLAGS[token.lower()]
+            if slot == 'compare':
+                parsed.compare = True
+            else:
+                pending = slot
+        elif first == '<' and MENTION.fullmatch(token):
+            continue # NOTE: discord already resolved it
+        elif ('=' in token or '<' in token or '>' in token) and (match := FILTER.fullmatch(token)):
+            field, op, value = match.groups()
+            filters.append(ScoreFilter(FILTER_FIELDS[field.lower()], op, float(value)))
+        else:
+            words.append(token) # NOTE: names like -GN are allowed
+
+    if pending is not None:
+        raise ArgumentError(f"`-{pending[0]}` needs a value.")
+
+    parsed.username = ' '.join(words) or None
+    parsed.filters = tuple(filters)
+
+    return parsed
@@ -0,0 +1,67 @@
+from __future__ import annotations
+
+from typing import Dict, Optional, Tuple
+
+from objects import glob
+from utils.cache import TTLCache, MISSING
+
+LINK_TTL = 60 * 60 # 1 hour, links barely ever change
+UNLINKED_TTL = 60 * 5 # unlinked users might link soon, keep them shorter
+
+class LinkHelper:
+    # NOTE: discord id -> (osu! name, mode) / last.fm username,
+    #       `None` means the user is known to not be linked
+    osu: TTLCache[int, Optional[Tuple[str, int]]] = TTLCache(maxsize=10_000, ttl=LINK_TTL)
+    lastfm: TTLCache[int, Optional[str]] = TTLCache(maxsize=10_000, ttl=LINK_TTL)
+
+    def __init__(self):
+        pass
+
+    @classmethod
+    def stats(cls) -> Dict[str, Dict]:
+        return {
+            'osu': cls.osu.stats(),
+            'lastfm': cls.lastfm.stats(),
+        }
+
+    async def get_osu(self, user_id: int) -> Optional[Tuple[str, int]]:
+        """get the linked osu! (name, mode) of a discord user"""
+        link = self.osu.get(user_id)
+        if link is not MISSING:
+            return link
+
+        result = await glob.db.fetch('select name, mode from users where id = %s', [user_id])
+
+        if result:
+            link = (result['name'], result['mode'])
+            self.osu.set(user_id, link)
+        else:
+            link = None
+            self.osu.set(user_id, link, ttl=UNLINKED_TTL)
+
+        return link
+
+    async def set_osu(self, user_id: int, name: str, mode: int) -> None:
+        self.osu.set(user_id, (name, mode))
+        glob.writer.upsert('users', ('id',), {'id': user_id, 'name': name, 'mode': mode})
+
+    async def get_lastfm(self, user_id: int) -> Optional[str]:
+        """get the linked last.fm username of a discord user"""
+        username = self.lastfm.get(user_id)
+        if username is not MISSING:
+            return username
+
+        result = await glob.db.fetch('select username from lastfm where id = %s', [user_id])
+
+        if result:
+            username = result['username']
+            self.lastfm.set(user_id, username)
+        else:
+            username = None
+            self.lastfm.set(user_id, username, ttl=UNLINKED_TTL)
+
+        return username
+
+    async def set_lastfm(self, user_id: int, username: str) -> None:
+        self.lastfm.set(user_id, username)
+        glob.writer.upsert('lastfm', ('id',), {'id': user_id, 'username': username})
@@ -0,0 +1,60 @@
+from __future__ import annotations
+
+import re
+
+from functools import lru_cache
+from typing import TYPE_CHECKING, Dict, FrozenSet
+
+if TYPE_CHECKING:
+    from discord.ext import commands
+
+# NOTE: same as discord.py's StringView.get_word, the invoker
+#       is everything right after the prefix up to the first whitespace
+_invoker = re.compile(r'\S*')
+
+@lru_cache(maxsize=64)
+def prefix_starts(prefix: str) -> FrozenSet[str]:
+    """first characters a message can start with for this prefix"""
+    return frozenset((prefix[:1].lower(), prefix[:1].upper()))
+
+class MessageFilter:
+    def __init__(self) -> None:
+        """drops messages that can't be a command before process_commands"""
+        self.commands: FrozenSet[str] = frozenset()
+
+        self.passed: int = 0
+        self.dropped_prefix: int = 0
+        self.dropped_command: int = 0
+
+    def rebuild(self, bot: commands.Bot) -> None:
+        """rebuild the command table from the loaded cogs"""
+        # NOTE: all_commands already has every alias as a key
+        self.commands = frozenset(name.lower() for name in bot.all_commands)
+
+    def is_command(self, content: str, prefix: str) -> bool:
+        # XXX: cheapest check first, most chatter dies here
+        if not content or content[0] not in prefix_starts(prefix):
+            self.dropped_prefix += 1
+            return False
+
+        length = len(prefix)
+
+        # NOTE: messages are lowered before processing, so compare lowered
+        if content[:length].lower() != prefix:
+            self.dropped_prefix += 1
+            return False
+
+        if _invoker.match(content, length).group().lower() not in self.commands:
+            self.dropped_command += 1
+            return False
+
+        self.passed += 1
+        return True
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'commands': len(self.commands),
+            'passed': self.passed,
+            'dropped_prefix': self.dropped_prefix,
+            'dropped_command': self.dropped_command,
+        }
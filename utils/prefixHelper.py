@@ -1,23 +1,78 @@
 from __future__ import annotations
 
+from typing import Dict
+
 from objects import glob
+from utils.logging import log, Ansi
+
+DEFAULT_PREFIX = '!'
 
 class PrefixHelper:
+    # NOTE: shared between every instance, loaded once at startup
+    #       and kept in sync write-through, so resolving a prefix
+    #       never has to hit the database.
+    cache: Dict[int, str] = {}
+    loaded: bool = False
+    hits: int = 0
+    misses: int = 0
+
     def __init__(self):
         pass
-    
+
+    @classmethod
+    async def load(cls) -> None:
+        """bulk load every guild prefix into the cache"""
+        rows = await glob.db.fetchall("select guild_id, prefix from guilds")
+
+        cls.cache = {int(row['guild_id']): row['prefix'] for row in rows}
+        cls.loaded = True
+        log(f"loaded {len(cls.cache)} guild prefixes", Ansi.LGREEN)
+
+    @classmethod
+    def cached_prefix(cls, guild_id: int) -> str:
+        """get a prefix without touching the network"""
+        prefix = cls.cache.get(guild_id)
+        if prefix is None:
+            # NOTE: no custom prefix (or not loaded yet), the default isn't a cache hit
+            cls.misses += 1
+            return DEFAULT_PREFIX
+
+        cls.hits += 1
+        return prefix
+
+    @classmethod
+    def peek(cls, guild_id: int) -> str:
+        """cached_prefix without touching the hit/miss counters, for the message filter"""
+        return cls.cache.get(guild_id, DEFAULT_PREFIX)
+
+    @classmethod
+    def stats(cls) -> Dict[str, int]:
+        return {
+            'size': len(cls.cache),
+            'hits': cls.hits,
+            'misses': cls.misses,
+        }
+
     async def get_prefix(self, guild_id: int) -> str:
+        if self.loaded or guild_id in self.cache:
+            return self.cached_prefix(guild_id)
+
+        # XXX: cache not loaded yet (db was down at startup?), fall back to the db
+        PrefixHelper.misses += 1
         result = await glob.db.fetch("select prefix from guilds where guild_id = %s", [guild_id])
-        
+
         # XXX: r\eturn default prefix if no custom prefix is set
-        return result['prefix'] if result else '!'
-    
+        prefix = result['prefix'] if result else DEFAULT_PREFIX
+        PrefixHelper.cache[guild_id] = prefix
+        return prefix
+
     async def set_prefix(self, guild_id: int, prefix: str) -> None:
-        await glob.db.execute(
-            'insert into guilds (guild_id, prefix) '
-            'values (%s, %s) '
-            'on duplicate key update prefix = %s', 
-            [guild_id, prefix, prefix])
-    
+        # NOTE: written behind, the cache is what everyone reads anyway
+        PrefixHelper.cache[guild_id] = prefix
+        glob.writer.upsert('guilds', ('guild_id',), {'guild_id': guild_id, 'prefix': prefix})
+
     async def delete_prefix(self, guild_id: int) -> None:
-        await glob.db.execute("delete from guilds where guild_id = %s", [guild_id])
\ No newline at end of file
+        # NOTE: through the writer, a flush in flight could otherwise bring the row back
+        await glob.writer.delete('guilds', ('guild_id',), (guild_id,))
+
+        PrefixHelper.cache.pop(guild_id, None)
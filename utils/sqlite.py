@@ -0,0 +1,129 @@
+from __future__ import annotations
+
+import asyncio
+import sqlite3
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, TypeVar
+
+from utils.database import QueryStats
+
+T = TypeVar('T')
+
+class SQLiteDatabase(QueryStats):
+    def __init__(self, path: str, schema: Optional[str] = None, slow_query_ms: float = 250.0) -> None:
+        """
+        embedded storage backend, same fetch/fetchall/execute api as Database.
+
+        every query runs on one dedicated thread so the event loop never blocks
+        on disk, queries are written with mysql style `%s` placeholders.
+        """
+        super().__init__(slow_query_ms)
+
+        self.path = path
+        self.schema = schema
+
+        self.conn: Optional[sqlite3.Connection] = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='sqlite')
+
+    async def _call(self, fn: Callable[..., T], *args: Any) -> T:
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    def _connect(self) -> None:
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+
+        # NOTE: autocommit, every statement is its own transaction like the mysql pool
+        conn = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+        conn.execute('pragma journal_mode = wal')
+        conn.execute('pragma synchronous = normal')
+
+        if self.schema:
+            conn.executescript(Path(self.schema).read_text())
+
+        self.conn = conn
+
+    async def connect(self) -> None:
+        await self._call(self._connect)
+
+    async def close(self) -> None:
+        if self.conn is not None:
+            await self._call(self.conn.close)
+            self.conn = None
+
+    async def reconnect(self, broken: Any = None) -> None:
+        await self.close()
+        await self.connect()
+
+    @staticmethod
+    def _translate(query: str) -> str:
+        # XXX: cmyui/mysql placeholders, our queries never have a literal %s
+        return query.replace('%s', '?')
+
+    def _fetch(self, query: str, params: Sequence[Any], _all: bool, _dict: bool) -> Any:
+        cur = self.conn.execute(self._translate(query), params)
+
+        rows = cur.fetchall() if _all else cur.fetchmany(1)
+        if _dict:
+            columns = [column[0] for column in cur.description]
+            rows = [dict(zip(columns, row)) for row in rows]
+
+        if _all:
+            return tuple(rows)
+
+        return rows[0] if rows else None
+
+    def _execute(self, query: str, params: Sequence[Any]) -> int:
+        return self.conn.execute(self._translate(query), params).lastrowid
+
+    def _executemany(self, query: str, params: List[Sequence[Any]]) -> None:
+        with self.conn:
+            self.conn.executemany(self._translate(query), params)
+
+    async def _timed(self, query: str, fn: Callable[..., T], *args: Any) -> T:
+        statement, histogram = self.histogram(query)
+        start = time.perf_counter()
+
+        try:
+            result = await self._call(fn, *args)
+        except Exception:
+            histogram.errors += 1
+            raise
+
+        self.observe(statement, histogram, (time.perf_counter() - start) * 1000)
+        return result
+
+    async def fetch(self, query: str, params: Sequence[Any] = [],
+                    _all: bool = False, _dict: bool = True) -> Any:
+        return await self._timed(query, self._fetch, query, params, _all, _dict)
+
+    async def fetchall(self, query: str, params: Sequence[Any] = [], _dict: bool = True) -> Any:
+        return await self.fetch(query, params, _all=True, _dict=_dict)
+
+    async def execute(self, query: str, params: Sequence[Any] = [], idempotent: bool = False) -> int:
+        return await self._timed(query, self._execute, query, params)
+
+    async def executemany(self, query: str, params: List[Sequence[Any]]) -> None:
+        """run one statement for many rows in a single transaction"""
+        await self._timed(query, self._executemany, query, params)
+
+    @staticmethod
+    def build_upsert(table: str, key: Tuple[str, ...], columns: Tuple[str, ...], rows: int) -> str:
+        """multi-row `insert ... on conflict do update`, sqlite's flavour of the upsert"""
+        placeholders = f"({', '.join(['%s'] * len(columns))})"
+        updates = ', '.join(f"{column} = excluded.{column}" for column in columns if column not in key)
+
+        return (
+            f"insert into {table} ({', '.join(columns)}) "
+            f"values {', '.join([placeholders] * rows)} "
+            f"on conflict ({', '.join(key)}) do update set {updates}"
+        )
+
+    def stats(self, top: int = 5) -> Dict[str, Any]:
+        return {
+            'retried': 0,
+            'reconnects': 0,
+            'timeouts': 0,
+            'statements': self.hottest(top),
+        }
@@ -0,0 +1,194 @@
+from __future__ import annotations
+
+import asyncio
+import time
+
+from typing import Any, Dict, Optional, Tuple
+
+from objects import glob
+from utils.logging import log, Ansi
+
+# (table, key columns, columns) -> one multi-row statement per flush
+Target = Tuple[str, Tuple[str, ...], Tuple[str, ...]]
+
+class WriteBehind:
+    def __init__(self, max_batch: int = 100, flush_interval: float = 2.0, max_retries: int = 5) -> None:
+        """
+        queues upserts in front of glob.db and flushes them as multi-row
+        upserts (`insert ... on duplicate key update` on mysql).
+
+        repeated writes to the same key are coalesced, only the latest
+        row is written. a flush happens every `flush_interval` seconds
+        or as soon as `max_batch` rows are queued. a row that fails to
+        flush `max_retries` times in a row is dropped.
+        """
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+
+        self.pending: Dict[Target, Dict[Tuple[Any, ...], Dict[str, Any]]] = {}
+        self.depth: int = 0
+        # (table, key values) -> failed flushes so far
+        self.retries: Dict[Tuple[str, Tuple[Any, ...]], int] = {}
+
+        self._wakeup = asyncio.Event()
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._closing: bool = False
+
+        self.flushes: int = 0
+        self.rows_written: int = 0
+        self.coalesced: int = 0
+        self.failures: int = 0
+        self.dropped: int = 0
+        self.last_flush_ms: float = 0.0
+        self.max_flush_ms: float = 0.0
+        self.total_flush_ms: float = 0.0
+
+    def start(self) -> None:
+        self._closing = False
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self) -> None:
+        """stop the background flusher and write out everything left"""
+        # NOTE: no cancel, the loop finishes the flush it's in and exits
+        self._closing = True
+        self._wakeup.set()
+
+        if self._task is not None:
+            await self._task
+            self._task = None
+
+        await self.flush()
+
+    def upsert(self, table: str, key: Tuple[str, ...], row: Dict[str, Any]) -> None:
+        """queue a row, replacing any queued row with the same key"""
+        target = (table, key, tuple(row))
+        rows = self.pending.setdefault(target, {})
+        key_values = tuple(row[column] for column in key)
+
+        if key_values in rows:
+            self.coalesced += 1
+        else:
+            self.depth += 1
+
+        rows[key_values] = row
+
+        if self.depth >= self.max_batch:
+            self._wakeup.set()
+
+    def discard(self, table: str, key_values: Tuple[Any, ...]) -> None:
+        """drop queued writes for a key, e.g. before deleting it"""
+        for target, rows in self.pending.items():
+            if target[0] == table and rows.pop(key_values, None) is not None:
+                self.depth -= 1
+
+    async def delete(self, table: str, key: Tuple[str, ...], key_values: Tuple[Any, ...]) -> None:
+        """
+        delete a row right away. holds the flush lock, so a flush that
+        already took the row can't write it back after the delete.
+        """
+        async with self._lock:
+            self.discard(table, key_values)
+            await glob.db.execute(
+                f"delete from {table} where {' and '.join(f'{column} = %s' for column in key)}",
+                list(key_values)
+            )
+
+    async def _run(self) -> None:
+        while not self._closing:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+
+            self._wakeup.clear()
+            if self._closing:
+                break
+
+            try:
+                await self.flush()
+            except Exception as e:
+                log(f"error in write-behind flush: {e}", Ansi.YELLOW)
+
+    async def flush(self) -> None:
+        async with self._lock:
+            if not self.depth:
+                return
+
+            pending, self.pending = self.pending, {}
+            self.depth = 0
+
+            start = time.perf_counter()
+            targets = list(pending.items())
+
+            for i, (target, rows) in enumerate(targets):
+                table, key, columns = target
+                batch = list(rows.values())
+                if not batch:
+                    continue
+
+                try:
+                    # NOTE: upserts can safely be retried on a dropped connection
+                    await glob.db.execute(
+                        glob.db.build_upsert(table, key, columns, len(batch)),
+                        [row[column] for row in batch for column in columns],
+                        idempotent=True
+                    )
+                    self.rows_written += len(batch)
+
+                    if self.retries:
+                        for key_values in rows:
+                            self.retries.pop((table, key_values), None)
+                except asyncio.CancelledError:
+                    # XXX: cancelled mid-write, nothing after this point was flushed
+                    for unflushed, unflushed_rows in targets[i:]:
+                        self._requeue(unflushed, unflushed_rows, failed=False)
+                    raise
+                except Exception as e:
+                    self.failures += 1
+                    log(f"failed to flush {len(batch)} rows into {table}: {e}", Ansi.RED)
+                    self._requeue(target, rows)
+
+            elapsed = (time.perf_counter() - start) * 1000
+
+            self.flushes += 1
+            self.last_flush_ms = elapsed
+            self.max_flush_ms = max(self.max_flush_ms, elapsed)
+            self.total_flush_ms += elapsed
+
+    def _requeue(self, target: Target, rows: Dict[Tuple[Any, ...], Dict[str, Any]], failed: bool = True) -> None:
+        table = target[0]
+        queued = self.pending.setdefault(target, {})
+
+        for key_values, row in rows.items():
+            # XXX: rows queued while we were flushing are newer, keep those
+            if key_values in queued:
+                continue
+
+            if failed:
+                attempts = self.retries.get((table, key_values), 0) + 1
+                if attempts >= self.max_retries:
+                    self.retries.pop((table, key_values), None)
+                    self.dropped += 1
+                    log(f"dropping a {table} write for {key_values} after {attempts} failed flushes", Ansi.RED)
+                    continue
+
+                self.retries[(table, key_values)] = attempts
+
+            queued[key_values] = row
+            self.depth += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'depth': self.depth,
+            'flushes': self.flushes,
+            'rows_written': self.rows_written,
+            'coalesced': self.coalesced,
+            'failures': self.failures,
+            'dropped': self.dropped,
+            'last_flush_ms': self.last_flush_ms,
+            'max_flush_ms': self.max_flush_ms,
+            'avg_flush_ms': self.total_flush_ms / self.flushes if self.flushes else 0.0,
+        }